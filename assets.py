@@ -0,0 +1,281 @@
+import math
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable
+
+import pygame as pg
+
+
+SCALE_STEP = 0.05  # 拡大率をこの刻みに丸めて変形済み画像を使い回す
+
+
+def quantize_scale(scale: float, step: float = SCALE_STEP) -> float:
+    """
+    拡大率をstep刻みに丸める
+    引数1 scale：元の拡大率
+    引数2 step：丸める刻み幅
+    戻り値：丸めた拡大率（0にはならない）
+    """
+    return max(step, round(round(scale / step) * step, 6))
+
+
+def scale_steps(low: float, high: float, step: float = SCALE_STEP) -> list[float]:
+    """
+    quantize_scaleで丸めたときにlowからhighの間の拡大率が取りうる値をすべて返す
+    引数1 low：拡大率の最小値
+    引数2 high：拡大率の最大値
+    引数3 step：丸める刻み幅
+    戻り値：丸めた拡大率のリスト（小さい順）
+    """
+    first, last = quantize_scale(low, step), quantize_scale(high, step)
+    return [quantize_scale(first + i * step, step) for i in range(round((last - first) / step) + 1)]
+
+
+class AssetManager:
+    """
+    画像ファイルを一度だけ読み込み，画面のピクセル形式に変換して保持するクラス
+    回転・拡大縮小・反転した画像は (path, angle, scale, flip) をキーとした
+    上限付きLRUキャッシュに保存し，同じ変形を二度計算しない
+    画素単位の当たり判定用のマスクと，内部解像度に合わせて縮小した描画用の画像も
+    画像ごとに一度だけ作り，画像が捨てられると一緒に捨てる
+    Preloaderの別スレッドからも使えるよう，キャッシュの読み書きはロックで守る
+    """
+    def __init__(self, root: str = "", max_variants: int = 256):
+        """
+        引数1 root：相対パスの基準になるディレクトリ（空なら作業ディレクトリ）
+        引数2 max_variants：変形済み画像を保持する最大数
+        """
+        self.root = root
+        self.max_variants = max_variants
+        self._lock = threading.RLock()
+        self._base: dict[str, pg.Surface] = {}  # 変換済みの元画像
+        self._variants: OrderedDict[tuple, pg.Surface] = OrderedDict()  # 変形済み画像のLRU
+        self._masks: weakref.WeakKeyDictionary[pg.Surface, dict] = weakref.WeakKeyDictionary()  # 画像ごとのマスク
+        self._scaled: weakref.WeakKeyDictionary[pg.Surface, dict] = weakref.WeakKeyDictionary()  # 画像ごとの描画用の画像
+
+    def load(self, path: str) -> pg.Surface:
+        """
+        画像を読み込み，画面のピクセル形式に変換して返す（2回目以降はキャッシュから返す）
+        引数 path：画像ファイルのパス
+        戻り値：変換済みの画像Surface
+        """
+        with self._lock:
+            return self._load(path)
+
+    def _load(self, path: str) -> pg.Surface:
+        img = self._base.get(path)
+        if img is None:
+            img = pg.image.load(os.path.join(self.root, path))
+            if pg.display.get_surface() is not None:  # 画面が無いと変換できない
+                if img.get_flags() & pg.SRCALPHA or img.get_colorkey() is not None:
+                    img = img.convert_alpha()  # rotozoomでカラーキーが失われないよう透明度に変換
+                else:
+                    img = img.convert()
+            self._base[path] = img
+        return img
+
+    def get(self, path: str, angle: float = 0, scale: float = 1.0,
+            flip: tuple[bool, bool] = (False, False)) -> pg.Surface:
+        """
+        元画像を反転してから回転・拡大縮小した画像を返す
+        引数1 path：画像ファイルのパス
+        引数2 angle：回転角度（度）
+        引数3 scale：拡大率
+        引数4 flip：横方向，縦方向の反転の有無
+        戻り値：変形済みの画像Surface（共有されるので書き換えないこと）
+        """
+        with self._lock:
+            return self._get(path, angle, scale, flip)
+
+    def _get(self, path: str, angle: float, scale: float, flip: tuple[bool, bool]) -> pg.Surface:
+        key = (path, angle, scale, tuple(flip))
+        img = self._variants.get(key)
+        if img is not None:
+            self._variants.move_to_end(key)
+            return img
+        img = self._load(path)
+        if flip[0] or flip[1]:
+            img = pg.transform.flip(img, flip[0], flip[1])
+        if angle != 0 or scale != 1.0:
+            img = pg.transform.rotozoom(img, angle, scale)
+        self._variants[key] = img
+        if len(self._variants) > self.max_variants:
+            self._variants.popitem(last=False)  # 最も長く使われていない画像を捨てる
+        return img
+
+    def mask_of(self, img: pg.Surface, size: tuple[int, int] | None = None) -> pg.Mask:
+        """
+        画像の不透明な画素のマスクを返す（画像とsizeごとに一度だけ作る）
+        引数1 img：画像Surface（ASSETS.getやRotationTableの画像など，使い回される画像）
+        引数2 size：マスクの大きさ（画像より小さければ左上から切り取る．Noneなら画像と同じ）
+            スプライトの矩形が画像より小さいとき，矩形の中に描かれた部分だけで判定するのに使う
+        戻り値：マスク（共有されるので書き換えないこと）
+        """
+        size = img.get_size() if size is None else tuple(size)
+        with self._lock:
+            masks = self._masks.get(img)
+            if masks is None:
+                masks = self._masks[img] = {}
+            mask = masks.get(size)
+            if mask is None:
+                mask = pg.mask.from_surface(img)
+                if size != img.get_size():
+                    full, mask = mask, pg.Mask(size)
+                    mask.draw(full, (0, 0))
+                masks[size] = mask
+            return mask
+
+    def scaled(self, img: pg.Surface, factor: float) -> pg.Surface:
+        """
+        画像を描画の内部解像度に合わせてfactor倍した画像を返す（画像とfactorごとに一度だけ作る）
+        引数1 img：画像Surface
+        引数2 factor：倍率（1なら画像をそのまま返す）
+        戻り値：拡大縮小した画像（共有されるので書き換えないこと）
+        """
+        if factor == 1:
+            return img
+        with self._lock:
+            scaled = self._scaled.get(img)
+            if scaled is None:
+                scaled = self._scaled[img] = {}
+            out = scaled.get(factor)
+            if out is None:
+                w, h = img.get_size()
+                size = (max(1, round(w * factor)), max(1, round(h * factor)))
+                if img.get_bitsize() in (24, 32):
+                    out = pg.transform.smoothscale(img, size)  # 一度だけなので画質の良い方で縮小する
+                else:
+                    out = pg.transform.scale(img, size)
+                scaled[factor] = out
+            return out
+
+    def prescale(self, factor: float, extra: list[pg.Surface] = ()):
+        """
+        読み込み済み・変形済みの画像をすべて，あらかじめfactor倍しておく（プレイ中に拡大縮小しないようにする）
+        引数1 factor：倍率
+        引数2 extra：キャッシュの外で持っている画像（RotationTableの画像など）
+        """
+        with self._lock:
+            imgs = list(self._base.values()) + list(self._variants.values())
+        for img in imgs + list(extra):
+            self.scaled(img, factor)
+
+    def clear(self):
+        """
+        保持している画像をすべて破棄する
+        """
+        with self._lock:
+            self._base.clear()
+            self._variants.clear()
+            self._masks.clear()
+            self._scaled.clear()
+
+
+class Preloader:
+    """
+    画像の読み込みや変形などの仕事を別スレッドで順に実行するクラス
+    画面を表示している間に裏で準備を進め，進み具合をprogressで確認できる
+    （画像の読み込み中はpygameがGILを手放すので，メインスレッドは止まらない）
+    """
+    def __init__(self, jobs: list[Callable[[], object]]):
+        """
+        引数 jobs：引数なしで呼ぶ仕事のリスト（前から順に実行する）
+        """
+        self.jobs = list(jobs)
+        self.done = 0  # 終わった仕事の数
+        self.error: BaseException | None = None  # 仕事で起きた例外
+        self.elapsed: float | None = None  # 全部終わるまでにかかった時間（秒）
+        self._thread = threading.Thread(target=self._run, name="preload", daemon=True)
+
+    def start(self) -> "Preloader":
+        """
+        別スレッドで仕事を始める
+        戻り値：self
+        """
+        self._thread.start()
+        return self
+
+    def _run(self):
+        t0 = time.perf_counter()
+        try:
+            for job in self.jobs:
+                job()
+                self.done += 1
+        except BaseException as e:  # メインスレッドのjoin()で改めて投げる
+            self.error = e
+        self.elapsed = time.perf_counter() - t0
+
+    @property
+    def progress(self) -> float:
+        """
+        終わった仕事の割合（0〜1）
+        """
+        return self.done / len(self.jobs) if self.jobs else 1.0
+
+    @property
+    def finished(self) -> bool:
+        """
+        すべての仕事が終わった（または失敗した）かどうか
+        """
+        return self.elapsed is not None
+
+    def join(self):
+        """
+        すべての仕事が終わるまで待つ（仕事で例外が起きていれば投げ直す）
+        """
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+class RotationTable:
+    """
+    画像をresolution等分した向きにあらかじめ回転させておく表
+    各向きの単位方向ベクトルも合わせて保持し，発射時に三角関数や回転を計算しない
+    """
+    def __init__(self, img: pg.Surface, resolution: int = 360):
+        """
+        引数1 img：角度0度（右向き）の元画像
+        引数2 resolution：向きの分割数（大きいほど角度が正確だがメモリを使う）
+        """
+        self.resolution = max(1, resolution)
+        self.step = 360 / self.resolution  # 1向きあたりの角度
+        self.imgs = []
+        self.vecs = []
+        for i in range(self.resolution):
+            rad = math.radians(i * self.step)
+            self.imgs.append(pg.transform.rotozoom(img, i * self.step, 1.0))
+            self.vecs.append((math.cos(rad), -math.sin(rad)))  # 画面座標はy軸が下向き
+        self._dire_index: dict[tuple[int, int], int] = {}
+
+    def index(self, angle: float) -> int:
+        """
+        角度に最も近い向きの番号を返す
+        引数 angle：角度（度）
+        戻り値：向きの番号
+        """
+        return round(angle / self.step) % self.resolution
+
+    def index_of(self, dx: int, dy: int) -> int:
+        """
+        方向ベクトル（めじろうの向きなど）に最も近い向きの番号を返す
+        引数1 dx：x方向成分
+        引数2 dy：y方向成分
+        戻り値：向きの番号
+        """
+        idx = self._dire_index.get((dx, dy))
+        if idx is None:
+            idx = self.index(math.degrees(math.atan2(-dy, dx)))
+            self._dire_index[(dx, dy)] = idx
+        return idx
+
+    def spread(self, num: int) -> list[int]:
+        """
+        全周をnum等分した向きの番号のリストを返す
+        引数 num：向きの数
+        戻り値：向きの番号のリスト
+        """
+        return [round(i * self.resolution / num) % self.resolution for i in range(num)]
@@ -0,0 +1,239 @@
+"""
+ゲームループの負荷ベンチマーク
+ゲームのクラスから負荷の高い場面を直接作り，1ティック（状態の更新と描画）あたりの処理時間を計る
+結果はJSONで書き出せ，保存しておいた基準の結果と比べて遅くなっていれば終了コード1で終わる
+
+実行例：
+    SDL_VIDEODRIVER=dummy python bench.py --json baseline.json
+    SDL_VIDEODRIVER=dummy python bench.py --baseline baseline.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, NamedTuple
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # 標準出力に結果を書けるよう，pygameの挨拶を出さない
+
+import numpy as np
+import pygame as pg
+
+import mejirou
+from mejirou import (EXPLOSION_POOL, FPS, HEIGHT, WIDTH, Enemy, GameState, Inputs, Renderer, TimeBird,
+                     preload_jobs)
+from viewport import Viewport
+from waves import Wave
+
+
+class Scenario(NamedTuple):
+    """
+    ベンチマークの場面
+    """
+    name: str
+    setup: Callable[[GameState], None]  # 計測前に状態を作る関数
+    tick: Callable[[GameState], Inputs]  # 毎ティックの前に呼び，そのティックの入力を返す関数
+    waves: list[Wave] | None = None  # ウェーブ表（Noneなら元のゲームと同じ出方）
+
+
+IDLE = Inputs.make()
+
+
+def hide_bird(state: GameState):
+    """
+    めじろうを画面の下の外に置き，爆弾が画面を縦断しても当たらないようにする
+    """
+    state.bird.rect.center = (WIDTH // 2, HEIGHT + 1000)
+
+
+def stopped_enemies(n: int) -> Scenario:
+    """
+    停止状態のn機の敵機が爆弾を投下し続ける場面
+    """
+    def setup(state: GameState):
+        hide_bird(state)
+        for _ in range(n):
+            emy = Enemy(state.rng)
+            emy.rect.centery = emy.bound + 1  # 最初の更新で停止状態になり，爆弾投下が予定に入る
+            state.add_enemy(emy)
+    return Scenario(f"bombs-{n}", setup, lambda state: IDLE)
+
+
+def neobeam_bursts(every: int) -> Scenario:
+    """
+    everyティックごとに32方向の拡散ビームを撃つ場面
+    """
+    def tick(state: GameState) -> Inputs:
+        if state.tmr % every:
+            return IDLE
+        state.skill.value = state.skill.max  # スキルゲージを満タンにしておく
+        return Inputs.make(pressed=[pg.K_RETURN])
+    return Scenario(f"neobeam-every{every}", lambda state: None, tick)
+
+
+def explosions(n: int) -> Scenario:
+    """
+    常にn個の爆発が表示されている場面
+    """
+    anchor = pg.sprite.Sprite()
+    anchor.rect = pg.Rect(0, 0, 1, 1)
+
+    def tick(state: GameState) -> Inputs:
+        for _ in range(n - len(state.exps)):  # 消えた分を補充する
+            anchor.rect.center = (state.rng.randint(0, WIDTH), state.rng.randint(0, HEIGHT))
+            state.spawn(state.exps, EXPLOSION_POOL.acquire(anchor, state.rng.randint(20, 100)))
+        return IDLE
+    return Scenario(f"explosions-{n}", lambda state: None, tick)
+
+
+def time_birds(per_tick: int) -> Scenario:
+    """
+    毎ティックper_tick羽の時間めじろうが出現し，めじろうがビームを撃ち続ける場面
+    """
+    space = Inputs.make(pressed=[pg.K_SPACE])
+
+    def tick(state: GameState) -> Inputs:
+        for _ in range(per_tick):
+            state.add_time_bird(TimeBird(state.rng.choice([2, 3]), state.rng))
+        return space
+    return Scenario(f"timebirds-{per_tick}pt", lambda state: None, tick)
+
+
+def dense_waves(enemy_every: int, enemies: int) -> Scenario:
+    """
+    ウェーブ表により，enemy_everyティックごとにenemies機の敵機が出現し，短い間隔で爆弾を投下する場面
+    """
+    waves = [Wave(0, enemy_every, enemies, (20, 120), FPS)]
+    return Scenario(f"waves-{enemies}per{enemy_every}", hide_bird, lambda state: IDLE, waves)
+
+
+SCENARIOS = [
+    Scenario("idle", lambda state: None, lambda state: IDLE),
+    stopped_enemies(50),
+    stopped_enemies(200),
+    stopped_enemies(1000),
+    neobeam_bursts(5),
+    explosions(300),
+    time_birds(2),
+    dense_waves(25, 3),
+]
+
+
+def run(scenario: Scenario, view: Viewport | None, ticks: int, warmup: int,
+        seed: int = 0, precise: bool = False) -> dict[str, float | dict[str, int]]:
+    """
+    場面を実行して1ティックあたりの処理時間を計る
+    引数1 scenario：場面
+    引数2 view：描画先（Noneなら描画しない）
+    引数3 ticks：計測するティック数
+    引数4 warmup：計測の前に進めるティック数
+    引数5 seed：乱数のシード
+    引数6 precise：画素単位の当たり判定を使うかどうか
+    戻り値：1秒あたりのティック数とティック時間のパーセンタイル（ミリ秒）などの辞書
+    """
+    state = GameState(seed, total_time=10**6, precise=precise, waves=scenario.waves)  # 時間切れにならないようにする
+    scenario.setup(state)
+    renderer = Renderer(view, state, mejirou.ASSETS.load("fig/haikei.png")) if view is not None else None
+    times = np.empty(ticks)
+    for i in range(warmup + ticks):
+        start = time.perf_counter()
+        state.step(scenario.tick(state))
+        if renderer is not None:
+            renderer.draw()
+        end = time.perf_counter()
+        state.over = None  # 爆弾に当たっても続ける
+        if i >= warmup:
+            times[i - warmup] = end - start
+    counts = dict(zip(mejirou.PROFILER.counters, state.counts()))
+    state.close()
+    ms = times * 1000
+    p50, p95, p99 = np.percentile(ms, (50, 95, 99)).tolist()
+    return {"ticks_per_sec": ticks / times.sum(), "mean_ms": float(ms.mean()), "p50_ms": p50,
+            "p95_ms": p95, "p99_ms": p99, "max_ms": float(ms.max()), "final_counts": counts}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    結果を基準と比べ，遅くなった場面の説明のリストを返す
+    1秒あたりのティック数がthresholdの割合より減るか，p95がthresholdの割合より増えたら遅くなったとみなす
+    """
+    regressions = []
+    for name, cur in results["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        if cur["ticks_per_sec"] < base["ticks_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: ticks/s {base['ticks_per_sec']:.0f} -> {cur['ticks_per_sec']:.0f}")
+        if cur["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.3f} -> {cur['p95_ms']:.3f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ゲームループの負荷ベンチマーク")
+    parser.add_argument("--ticks", type=int, default=500, help="各場面で計測するティック数")
+    parser.add_argument("--warmup", type=int, default=50, help="計測の前に進めるティック数")
+    parser.add_argument("--no-render", action="store_true", help="描画せずに状態の更新だけを計る")
+    parser.add_argument("--render-scale", type=float, default=1.0,
+                        help="描画の内部解像度の倍率（1でなければ縮小した画面外Surfaceに描いて拡大転送する）")
+    parser.add_argument("--precise-hits", action="store_true", help="画素単位の当たり判定を使う")
+    parser.add_argument("--only", nargs="*", default=None, help="実行する場面の名前")
+    parser.add_argument("--json", metavar="PATH", default=None, help="結果をJSONで書き出すファイル（-なら標準出力）")
+    parser.add_argument("--baseline", metavar="PATH", default=None, help="比べる基準の結果のJSONファイル")
+    parser.add_argument("--threshold", type=float, default=0.15, help="遅くなったとみなす割合")
+    args = parser.parse_args()
+
+    pg.init()
+    view = Viewport(pg.display.set_mode((WIDTH, HEIGHT)), (WIDTH, HEIGHT), args.render_scale, assets=mejirou.ASSETS)
+    for job in preload_jobs(args.render_scale):
+        job()
+    render_to = None if args.no_render else view
+
+    results = {
+        "version": 1,
+        "ticks": args.ticks,
+        "render": render_to is not None,
+        "precise": args.precise_hits,
+        "render_scale": args.render_scale,
+        "python": platform.python_version(),
+        "pygame": pg.version.ver,
+        "numpy": np.__version__,
+        "scenarios": {},
+    }
+    log = sys.stderr if args.json == "-" else sys.stdout
+    print(f"{'scenario':>18} {'ticks/s':>9} {'mean':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}  [ms]", file=log)
+    for scenario in SCENARIOS:
+        if args.only and scenario.name not in args.only:
+            continue
+        r = run(scenario, render_to, args.ticks, args.warmup, precise=args.precise_hits)
+        results["scenarios"][scenario.name] = r
+        print(f"{scenario.name:>18} {r['ticks_per_sec']:>9.0f} {r['mean_ms']:>7.3f} {r['p50_ms']:>7.3f} "
+              f"{r['p95_ms']:>7.3f} {r['p99_ms']:>7.3f} {r['max_ms']:>7.3f}", file=log)
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        settings = ("render", "ticks", "precise", "render_scale")
+        if any(baseline.get(k) != results[k] for k in settings):
+            print("warning: baseline was measured with different --ticks/--no-render/--precise-hits/--render-scale settings",
+                  file=log)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=log)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions (threshold {args.threshold:.0%})", file=log)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+ビームと標的の当たり判定のベンチマーク
+groupcollideを3回呼ぶ従来の方法と，箱の配列でまとめて調べるfirst_hitsの1回あたりの処理時間を，
+ビームと標的の数を増やしながら比較する
+
+実行例：python bench_collision.py --repeat 50
+"""
+import argparse
+import random
+import time
+
+import pygame as pg
+
+import numpy as np
+
+from collision import SpatialHash, boxes_of, first_hits
+
+
+WIDTH, HEIGHT = 1100, 650
+GRID = SpatialHash()  # ゲームと同じく作業用のグリッドを使い回す
+
+
+class Box(pg.sprite.Sprite):
+    """
+    矩形だけを持つ計測用のスプライト
+    """
+    def __init__(self, rng: random.Random, w: int, h: int, bottom: int = HEIGHT):
+        super().__init__()
+        self.rect = pg.Rect(rng.randint(0, WIDTH - w), rng.randint(0, bottom - h), w, h)
+
+
+def build(rng: random.Random, n_beams: int, n_targets: int):
+    """
+    ビームと3種類の標的（敵機，爆弾，時間めじろう）のグループを作る
+    敵機は画面上半分の停止位置に，爆弾とビームは画面全体に散らばる
+    """
+    beams = pg.sprite.Group(Box(rng, 64, 20) for _ in range(n_beams))
+    beams.boxes = boxes_of(beams.sprites())
+    emys = pg.sprite.Group(Box(rng, 100, 100, HEIGHT // 2 + 50) for _ in range(n_targets // 5))
+    bombs = pg.sprite.Group(Box(rng, 43, 43) for _ in range(n_targets - n_targets // 5))
+    tbirds = pg.sprite.Group(Box(rng, 90, 100) for _ in range(4))
+    return beams, [emys, bombs, tbirds]
+
+
+def run_groupcollide(beams, targets):
+    for group in targets:
+        pg.sprite.groupcollide(group, beams, True, True)
+
+
+def run_vectorized(beams, targets):
+    # ビームの箱はProjectileEngineが配列で持っているので，標的の箱だけを作る
+    shots = beams.sprites()
+    first = first_hits(beams.boxes, np.concatenate([boxes_of(g.sprites()) for g in targets]), grid=GRID)
+    sprites = [s for g in targets for s in g]
+    for i in np.flatnonzero(first >= 0).tolist():
+        shots[i].kill()
+    for t in np.unique(first[first >= 0]).tolist():
+        sprites[t].kill()
+
+
+def measure(func, n_beams: int, n_targets: int, repeat: int) -> tuple[float, float]:
+    """
+    同じ配置を作り直しながらfuncをrepeat回実行する
+    戻り値：1回あたりの平均時間（ミリ秒）と，標的に当たって消えたビームの平均数
+    """
+    func(*build(random.Random(-1), n_beams, n_targets))  # 初回の呼び出しの準備にかかる時間は含めない
+    total = 0.0
+    hits = 0
+    for i in range(repeat):
+        beams, targets = build(random.Random(i), n_beams, n_targets)
+        start = time.perf_counter()
+        func(beams, targets)
+        total += time.perf_counter() - start
+        hits += n_beams - len(beams)
+    return total / repeat * 1000, hits / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="当たり判定のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=20, help="各条件の試行回数")
+    args = parser.parse_args()
+
+    print(f"{'beams':>6} {'targets':>8} {'hits':>6} {'groupcollide[ms]':>17} {'numpy[ms]':>10} {'speedup':>8}")
+    for n_beams, n_targets in [(32, 20), (128, 50), (512, 100), (2048, 200), (4096, 400)]:
+        base, hits = measure(run_groupcollide, n_beams, n_targets, args.repeat)
+        vec, _ = measure(run_vectorized, n_beams, n_targets, args.repeat)
+        print(f"{n_beams:>6} {n_targets:>8} {hits:>6.0f} {base:>17.3f} {vec:>10.3f} {base / vec:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
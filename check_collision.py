@@ -0,0 +1,137 @@
+"""
+当たり判定の検算
+乱数で作った箱について，グリッド（SpatialHash）で求めた組を全組のoverlaps()と比べ，
+first_hitsの結果をグループごとに groupcollide を順に呼んだ結果と比べる
+マスクを使う場合は，箱が重なった組をすべてRect.colliderectとMask.overlapで調べた結果と比べる
+一致しない場合があれば内容を表示して終了コード1で終わる
+
+実行例：python check_collision.py --trials 500
+"""
+import argparse
+import random
+import sys
+
+import numpy as np
+import pygame as pg
+
+import collision
+from collision import SpatialHash, boxes_of, first_hits, overlaps
+
+
+WIDTH, HEIGHT = 1100, 650
+
+
+class Box(pg.sprite.Sprite):
+    """
+    矩形と，乱数で画素を埋めたマスクを持つ検算用のスプライト
+    """
+    def __init__(self, rng: random.Random, max_w: int, max_h: int):
+        super().__init__()
+        w, h = rng.randint(1, max_w), rng.randint(1, max_h)
+        # 画面の外にはみ出すものや，マスの境界にそろったものも作る
+        x = rng.choice([rng.randint(-w - 50, WIDTH + 50), rng.randint(-2, 18) * 64])
+        y = rng.choice([rng.randint(-h - 50, HEIGHT + 50), rng.randint(-2, 11) * 64])
+        self.rect = pg.Rect(x, y, w, h)
+        self.mask = pg.Mask((w, h))
+        for _ in range(rng.randint(1, 4)):
+            cx, cy = rng.randrange(w), rng.randrange(h)
+            for px in range(max(0, cx - 6), min(w, cx + 6)):
+                for py in range(max(0, cy - 6), min(h, cy + 6)):
+                    self.mask.set_at((px, py))
+
+
+def check_pairs(rng: random.Random, grid: SpatialHash) -> list[str]:
+    """
+    グリッドで求めた重なる組が，全組を調べた結果と同じで，重複が無いかを調べる
+    戻り値：一致しなかった内容のリスト
+    """
+    n, m = rng.randint(0, 300), rng.randint(0, 120)
+    a = np.array([(b.rect.left, b.rect.top, b.rect.right, b.rect.bottom)
+                  for b in (Box(rng, 120, 40) for _ in range(n))], dtype=float).reshape(-1, 4)
+    b = np.array([(t.rect.left, t.rect.top, t.rect.right, t.rect.bottom)
+                  for t in (Box(rng, 150, 150) for _ in range(m))], dtype=float).reshape(-1, 4)
+    if rng.random() < 0.5:  # 弾エンジンの箱と同じく端数のある座標も調べる
+        a += rng.random()
+    ii, jj = grid.build(b).pairs(a)
+    found = list(zip(ii.tolist(), jj.tolist()))
+    expected = set(zip(*(x.tolist() for x in np.nonzero(overlaps(a, b)))))
+    errors = []
+    if len(found) != len(set(found)):
+        errors.append(f"cell {grid.cell_size}: {len(found) - len(set(found))} duplicate pairs")
+    if set(found) != expected:
+        errors.append(f"cell {grid.cell_size}: {len(expected - set(found))} missing, "
+                      f"{len(set(found) - expected)} extra pairs ({n} x {m} boxes)")
+    return errors
+
+
+def chained_groupcollide(shots: list[Box], groups: list[list[Box]], masks: bool) -> list[int]:
+    """
+    グループごとに groupcollide(group, shots, True, True) を順に呼んだときに各弾が当たる標的を求める
+    戻り値：弾ごとの標的の通し番号（当たらなければ-1）のリスト
+    """
+    shot_group = pg.sprite.Group(shots)
+    number = {}
+    for group in groups:
+        for t in group:
+            number[t] = len(number)
+    result = {}
+    collided = pg.sprite.collide_mask if masks else None
+    for group in groups:
+        hits = pg.sprite.groupcollide(pg.sprite.Group(group), shot_group, True, True, collided)
+        for target, hit_shots in hits.items():
+            for s in hit_shots:
+                result[s] = number[target]
+    return [result.get(s, -1) for s in shots]
+
+
+def check_first_hits(rng: random.Random, grid: SpatialHash, masks: bool) -> list[str]:
+    """
+    first_hitsの結果を，グループごとにgroupcollideを順に呼んだ結果と比べる
+    戻り値：一致しなかった内容のリスト
+    """
+    shots = [Box(rng, 64, 20) for _ in range(rng.randint(0, 200))]
+    groups = [[Box(rng, 100, 100) for _ in range(rng.randint(0, 10))],
+              [Box(rng, 43, 43) for _ in range(rng.randint(0, 40))],
+              [Box(rng, 90, 100) for _ in range(rng.randint(0, 4))]]
+    targets = [t for group in groups for t in group]
+    expected = chained_groupcollide(shots, groups, masks)
+    errors = []
+    for limit in (0, collision.DENSE_LIMIT):  # グリッドを使う場合と全組を調べる場合
+        collision.DENSE_LIMIT = limit
+        first = first_hits(boxes_of(shots), boxes_of(targets),
+                           (lambda i: shots[i].mask) if masks else None,
+                           (lambda j: targets[j].mask) if masks else None, grid)
+        if first.tolist() != expected:
+            bad = sum(x != y for x, y in zip(first.tolist(), expected))
+            errors.append(f"first_hits ({'grid' if limit == 0 else 'dense'}, masks={masks}): "
+                          f"{bad} of {len(shots)} shots differ from groupcollide")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="当たり判定の検算")
+    parser.add_argument("--trials", type=int, default=200, help="各検算の試行回数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    args = parser.parse_args()
+
+    limit = collision.DENSE_LIMIT
+    failures = 0
+    for trial in range(args.trials):
+        rng = random.Random(args.seed * 1000003 + trial)
+        errors = []
+        for cell_size in (16, 64, 128, 1000):
+            errors += check_pairs(rng, SpatialHash(cell_size))
+        try:
+            errors += check_first_hits(rng, SpatialHash(), masks=False)
+            errors += check_first_hits(rng, SpatialHash(), masks=True)
+        finally:
+            collision.DENSE_LIMIT = limit
+        for error in errors:
+            print(f"trial {trial}: {error}")
+        failures += bool(errors)
+    print(f"{args.trials - failures}/{args.trials} trials passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
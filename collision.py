@@ -0,0 +1,185 @@
+from typing import Callable
+
+import numpy as np
+import pygame as pg
+
+
+DENSE_LIMIT = 32768  # 組の数がこれ以下なら，グリッドを作らずに全組をまとめて調べる（NumPyの呼び出しが少なく速い）
+
+
+def boxes_of(sprites: list[pg.sprite.Sprite]) -> np.ndarray:
+    """
+    スプライトの矩形を当たり判定の箱の配列にする
+    引数 sprites：スプライトのリスト
+    戻り値：各行が(左, 上, 右, 下)の (n, 4) 配列
+    """
+    if not sprites:
+        return np.empty((0, 4))
+    return np.array([(s.rect.left, s.rect.top, s.rect.right, s.rect.bottom) for s in sprites], dtype=float)
+
+
+class SpatialHash:
+    """
+    登録した箱の範囲を一定サイズのマス目に区切り，各マスに重なる箱の番号を登録しておく一様グリッド
+    登録も問い合わせも箱の配列のままNumPyでまとめて行い，同じマスに入った組だけを箱どうしで調べるので，
+    全組を調べる総当たりを避けられる
+    """
+    def __init__(self, cell_size: int = 64):
+        """
+        引数 cell_size：1マスの一辺の長さ（ピクセル）
+        """
+        self.cell_size = cell_size
+        self.build(np.empty((0, 4)))
+
+    def _span(self, boxes: np.ndarray) -> np.ndarray:
+        """
+        各箱が重なるマスの範囲を返す（グリッドの外にはみ出す部分は端のマスに含める）
+        戻り値：各行が(左の列, 上の行, 右の列, 下の行)の (n, 4) 配列（右と下の列・行も範囲に含む）
+        """
+        c = boxes / self.cell_size
+        np.floor(c[:, :2], out=c[:, :2])
+        np.ceil(c[:, 2:], out=c[:, 2:])  # 右端と下端は箱に含まれないので1を引く（_shiftに含めてある）
+        c -= self._shift
+        np.maximum(c, 0, out=c)
+        np.minimum(c, self._last, out=c)
+        return c.astype(np.int64)
+
+    def _expand(self, span: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        各箱を重なるすべてのマスに展開する
+        引数 span：_span()の結果
+        戻り値：(箱の番号, マスの番号)の配列（箱ごとに並ぶ）
+        """
+        ny = span[:, 3] - span[:, 1] + 1
+        count = (span[:, 2] - span[:, 0] + 1) * ny
+        owner = np.repeat(np.arange(len(span)), count)
+        k = np.arange(len(owner)) - np.repeat(np.cumsum(count) - count, count)  # 箱の中での通し番号
+        ny = ny[owner]
+        return owner, (span[owner, 0] + k // ny) * self.shape[1] + span[owner, 1] + k % ny
+
+    def build(self, boxes: np.ndarray) -> "SpatialHash":
+        """
+        箱を登録し直す（グリッドは登録した箱が収まる大きさにする）
+        引数 boxes：(m, 4) の箱の配列
+        戻り値：self
+        """
+        self.boxes = boxes
+        self.columns = np.ascontiguousarray(boxes.T)  # 左・上・右・下の列
+        if len(boxes) == 0:
+            lo, hi = [0, 0], [1, 1]
+        else:
+            lo = np.floor(boxes[:, :2].min(axis=0) / self.cell_size).astype(int).tolist()
+            hi = np.ceil(boxes[:, 2:].max(axis=0) / self.cell_size).astype(int).tolist()
+        w, h = max(1, hi[0] - lo[0]), max(1, hi[1] - lo[1])
+        self.shape = (w, h)  # マスの(列数, 行数)
+        self._shift = np.array([lo[0], lo[1], lo[0] + 1, lo[1] + 1], dtype=float)
+        self._last = np.array([w - 1, h - 1, w - 1, h - 1], dtype=float)
+        self.span = self._span(boxes)
+        owner, cell = self._expand(self.span)
+        self.index = owner[np.argsort(cell, kind="stable")]  # マスの順に並べた箱の番号
+        self.start = np.zeros(w * h + 1, dtype=np.int64)  # マスごとのindexでの始まり
+        np.cumsum(np.bincount(cell, minlength=w * h), out=self.start[1:])
+        return self
+
+    def pairs(self, boxes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        箱と重なる登録済みの箱の組をすべて求める（Rect.colliderectと同じく辺が接するだけなら重ならない）
+        引数 boxes：(n, 4) の箱の配列
+        戻り値：重なる組の(boxesの番号, 登録した箱の番号)の配列．各組は1回ずつ現れる
+        """
+        if len(boxes) == 0 or len(self.boxes) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        span = self._span(boxes)
+        owner, cell = self._expand(span)
+        lo = self.start[cell]
+        count = self.start[cell + 1] - lo
+        entry = np.repeat(np.arange(len(cell)), count)  # 候補の組ごとの，問い合わせた(箱, マス)の番号
+        pos = np.repeat(lo - np.cumsum(count) + count, count) + np.arange(len(entry))
+        ii, jj = owner[entry], self.index[pos]
+        # 複数のマスで見つかる組は，重なった部分の左上の点を含むマス（2つの箱の左上のマスの右下側）でだけ数える
+        ref = (np.maximum(span[ii, 0], self.span[jj, 0]) * self.shape[1]
+               + np.maximum(span[ii, 1], self.span[jj, 1]))
+        keep = np.flatnonzero(ref == cell[entry])
+        ii, jj = ii[keep], jj[keep]
+        a, b = np.ascontiguousarray(boxes.T), self.columns
+        hit = (a[0, ii] < b[2, jj]) & (b[0, jj] < a[2, ii]) & (a[1, ii] < b[3, jj]) & (b[1, jj] < a[3, ii])
+        return ii[hit], jj[hit]
+
+
+def overlaps(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    箱の集合aとbの全組について重なっているかをまとめて調べる（Rect.colliderectと同じく辺が接するだけなら重ならない）
+    引数1 a：(n, 4) の箱の配列
+    引数2 b：(m, 4) の箱の配列
+    戻り値：(n, m) の真理値配列
+    """
+    return ((a[:, None, 0] < b[None, :, 2]) & (b[None, :, 0] < a[:, None, 2])
+            & (a[:, None, 1] < b[None, :, 3]) & (b[None, :, 1] < a[:, None, 3]))
+
+
+def overlapping_pairs(a: np.ndarray, b: np.ndarray,
+                      grid: SpatialHash | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    箱の集合aとbの重なる組をすべて求める
+    組の数がDENSE_LIMITを超えるときはbをグリッドに登録し，同じマスに入った組だけを調べる
+    引数1 a：(n, 4) の箱の配列
+    引数2 b：(m, 4) の箱の配列
+    引数3 grid：bを登録する作業用のグリッド（中身は作り直される．Noneなら必要なときに新しく作る）
+    戻り値：重なる組の(aの番号, bの番号)の配列．各組は1回ずつ現れる
+    """
+    if len(a) * len(b) <= DENSE_LIMIT:
+        return np.nonzero(overlaps(a, b))
+    return (grid or SpatialHash()).build(b).pairs(a)
+
+
+def refine(ii: np.ndarray, jj: np.ndarray, a: np.ndarray, b: np.ndarray,
+           a_mask: Callable[[int], pg.Mask], b_mask: Callable[[int], pg.Mask]) -> np.ndarray:
+    """
+    箱が重なった組だけをマスクで調べ直し，不透明な画素どうしが重なるかを求める
+    マスクの左上は箱の左上に合わせる
+    引数1 ii：組のaの番号の配列
+    引数2 jj：組のbの番号の配列
+    引数3 a：(n, 4) の箱の配列
+    引数4 b：(m, 4) の箱の配列
+    引数5 a_mask：aの番号からマスクを返す関数（調べる組の分しか呼ばない）
+    引数6 b_mask：bの番号からマスクを返す関数
+    戻り値：組ごとに画素が重なればTrueの真理値配列
+    """
+    keep = np.ones(len(ii), dtype=bool)
+    if len(ii) == 0:
+        return keep
+    dx = (np.rint(b[jj, 0]) - np.rint(a[ii, 0])).astype(int).tolist()
+    dy = (np.rint(b[jj, 1]) - np.rint(a[ii, 1])).astype(int).tolist()
+    for k, (i, j, x, y) in enumerate(zip(ii.tolist(), jj.tolist(), dx, dy)):
+        if a_mask(i).overlap(b_mask(j), (x, y)) is None:
+            keep[k] = False
+    return keep
+
+
+def first_hits(shots: np.ndarray, targets: np.ndarray,
+               shot_mask: Callable[[int], pg.Mask] | None = None,
+               target_mask: Callable[[int], pg.Mask] | None = None,
+               grid: SpatialHash | None = None) -> np.ndarray:
+    """
+    各弾が当たる標的のうち最も先頭のものを求める
+    弾と標的が多いときは標的をグリッドに登録し，同じマスに入った組だけを箱どうしで調べる
+    標的をグループ順に並べておけば，グループごとに groupcollide(group, shots, True, True) を
+    順に呼んだのと同じ組み合わせになる
+    引数1 shots：弾の (n, 4) の箱の配列
+    引数2 targets：標的の (m, 4) の箱の配列（前のものほど優先される）
+    引数3 shot_mask：弾の番号からマスクを返す関数（与えると箱が重なった組だけ画素単位で調べ直す）
+    引数4 target_mask：標的の番号からマスクを返す関数
+    引数5 grid：標的を登録する作業用のグリッド（中身は作り直される．Noneなら必要なときに新しく作る）
+    戻り値：弾ごとの標的の番号（当たらなければ-1）の配列
+    """
+    if len(shots) == 0 or len(targets) == 0:
+        return np.full(len(shots), -1)
+    ii, jj = overlapping_pairs(shots, targets, grid)
+    if shot_mask is not None and target_mask is not None:
+        keep = refine(ii, jj, shots, targets, shot_mask, target_mask)
+        ii, jj = ii[keep], jj[keep]
+    first = np.full(len(shots), len(targets))
+    np.minimum.at(first, ii, jj)  # 弾ごとに最も前の標的
+    first[first == len(targets)] = -1
+    return first
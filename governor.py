@@ -0,0 +1,83 @@
+from collections import deque
+from typing import Callable, Generic, Sequence, TypeVar
+
+
+T = TypeVar("T")
+
+
+class Governor(Generic[T]):
+    """
+    直近のフレーム時間の移動平均を見て，描画の品質を段階的に下げたり戻したりするクラス
+    levelsの0番目が最高品質で，番号が大きいほど軽い設定とする
+    平均が予算のdegrade_atの割合を超えたら1段下げ，restore_atの割合を下回り続けたら1段戻す
+    切り替えた直後は平均が新しい設定を反映するまで待ち，行ったり来たりしないようにする
+    """
+    def __init__(self, levels: Sequence[T], budget_ms: float, window: int = 30,
+                 degrade_at: float = 0.9, restore_at: float = 0.5, restore_hold: int = 90,
+                 log: Callable[[str], None] | None = None):
+        """
+        引数1 levels：品質の設定のリスト（最高品質から順に軽くなる）
+        引数2 budget_ms：1フレームに使ってよい時間（ミリ秒）
+        引数3 window：移動平均をとるフレーム数（切り替えた後もこのフレーム数は次の切り替えをしない）
+        引数4 degrade_at：品質を下げる平均の予算に対する割合
+        引数5 restore_at：品質を戻す平均の予算に対する割合
+        引数6 restore_hold：品質を戻すまでに，前の切り替えから空けるフレーム数
+        引数7 log：切り替えたときに説明の文字列を渡す関数（Noneなら記録だけする）
+        """
+        self.levels = list(levels)
+        self.budget_ms = budget_ms
+        self.window = window
+        self.degrade_at = degrade_at
+        self.restore_at = restore_at
+        self.restore_hold = restore_hold
+        self.log = log
+        self.level = 0  # 今の設定の番号
+        self.frames = 0  # 見たフレーム数
+        self.changed_at = 0  # 最後に切り替えたときのフレーム数
+        self.history: list[tuple[int, int, int, float]] = []  # 切り替えの(フレーム数, 前の番号, 後の番号, 平均ms)
+        self._times: deque[float] = deque(maxlen=window)
+        self._sum = 0.0
+
+    @property
+    def current(self) -> T:
+        """
+        今の品質の設定
+        """
+        return self.levels[self.level]
+
+    @property
+    def average_ms(self) -> float:
+        """
+        直近windowフレームのフレーム時間の平均（ミリ秒）
+        """
+        return self._sum / len(self._times) if self._times else 0.0
+
+    def observe(self, frame_ms: float) -> bool:
+        """
+        1フレームの時間を記録し，必要なら品質を切り替える
+        引数 frame_ms：フレームの処理にかかった時間（ミリ秒．待ち時間は含めない）
+        戻り値：品質を切り替えたらTrue
+        """
+        if len(self._times) == self.window:
+            self._sum -= self._times[0]
+        self._times.append(frame_ms)
+        self._sum += frame_ms
+        self.frames += 1
+        if len(self._times) < self.window:
+            return False
+        since = self.frames - self.changed_at
+        avg = self.average_ms
+        if avg > self.budget_ms * self.degrade_at and self.level < len(self.levels) - 1 and since >= self.window:
+            return self._switch(self.level + 1, avg)
+        if avg < self.budget_ms * self.restore_at and self.level > 0 and since >= self.restore_hold:
+            return self._switch(self.level - 1, avg)
+        return False
+
+    def _switch(self, level: int, avg: float) -> bool:
+        self.history.append((self.frames, self.level, level, avg))
+        if self.log is not None:
+            self.log(f"quality {self.level} -> {level} ({self.levels[level]}) at frame {self.frames}: "
+                     f"avg {avg:.1f} ms, budget {self.budget_ms:.1f} ms")
+        self.level = level
+        self.changed_at = self.frames
+        return True
@@ -0,0 +1,82 @@
+import pygame as pg
+
+
+class DigitAtlas:
+    """
+    数字などの文字をあらかじめ1文字ずつ描画しておき，
+    数値の文字列を小さな画像の転送だけで組み立てるクラス
+    """
+    def __init__(self, font: pg.font.Font, color: tuple[int, int, int],
+                 antialias: bool = True, chars: str = "0123456789-"):
+        """
+        引数1 font：文字のフォント
+        引数2 color：文字色
+        引数3 antialias：アンチエイリアスの有無
+        引数4 chars：あらかじめ描画しておく文字
+        """
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+        self.glyphs = {c: font.render(c, antialias, color) for c in chars}
+        self.height = max(g.get_height() for g in self.glyphs.values())
+
+    def glyph(self, c: str) -> pg.Surface:
+        """
+        1文字分の画像を返す（表に無い文字はその場で描画して追加する）
+        引数 c：文字
+        戻り値：文字の画像Surface
+        """
+        img = self.glyphs.get(c)
+        if img is None:
+            img = self.font.render(c, self.antialias, self.color)
+            self.glyphs[c] = img
+        return img
+
+    def render(self, text: str, prefix: pg.Surface | None = None) -> pg.Surface:
+        """
+        文字列を1文字ずつ並べた画像を返す
+        引数1 text：描画する文字列
+        引数2 prefix：先頭に付ける描画済みの画像
+        戻り値：文字列の画像Surface（背景は透明）
+        """
+        imgs = [self.glyph(c) for c in text]
+        x = prefix.get_width() if prefix is not None else 0
+        height = max([self.height] + ([prefix.get_height()] if prefix is not None else []))
+        img = pg.Surface((x + sum(g.get_width() for g in imgs), height), pg.SRCALPHA)
+        if prefix is not None:
+            img.blit(prefix, (0, 0))
+        for g in imgs:
+            img.blit(g, (x, 0))
+            x += g.get_width()
+        return img
+
+
+class CachedLabel:
+    """
+    「Score: 12」のような固定の見出し＋数値のラベルを，
+    数値が変わったときだけ作り直すクラス
+    """
+    def __init__(self, font: pg.font.Font, color: tuple[int, int, int],
+                 prefix: str = "", antialias: bool = True):
+        """
+        引数1 font：文字のフォント
+        引数2 color：文字色
+        引数3 prefix：数値の前に付ける見出し
+        引数4 antialias：アンチエイリアスの有無
+        """
+        self.atlas = DigitAtlas(font, color, antialias)
+        self.prefix = font.render(prefix, antialias, color) if prefix else None
+        self.value = None
+        self.image = pg.Surface((0, 0))
+
+    def set(self, value: int) -> bool:
+        """
+        表示する数値を設定する
+        引数 value：表示する数値
+        戻り値：画像を作り直したらTrue
+        """
+        if value == self.value:
+            return False
+        self.value = value
+        self.image = self.atlas.render(str(value), self.prefix)
+        return True
@@ -1,14 +1,45 @@
+import argparse
 import math
 import os
 import random
 import sys
 import time
+from collections import defaultdict
+from functools import partial
+from typing import Callable, Iterable, Mapping, NamedTuple, Sequence
+import numpy as np
 import pygame as pg
 
+from assets import AssetManager, Preloader, RotationTable, quantize_scale, scale_steps
+from collision import SpatialHash, boxes_of, first_hits, overlapping_pairs, refine
+from governor import Governor
+from projectiles import ProjectileEngine
+from hud import CachedLabel
+from pool import Pool, PooledSprite
+from profiler import Profiler, ProfilerOverlay
+from replay import InputLog
+from scheduler import Scheduler
+from scenes import Scene, SceneManager
+from telemetry import Telemetry
+from timestep import FixedTimestep
+from viewport import Viewport
+from waves import Wave, load_waves, table_hash
+
 
 WIDTH = 1100  # ゲームウィンドウの幅
 HEIGHT = 650  # ゲームウィンドウの高さ
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+FPS = 50  # 1秒あたりのティック数（シミュレーションの刻み．描画の頻度とは独立）
+MAX_FPS = 120  # プレイ中の描画の最大フレームレートの既定値（CPUを使い切らないように制限する）
+ENEMY_SPAWN_TICKS = 4 * FPS  # 敵機を出現させる間隔
+TIMEBIRD_SPAWN_TICKS = 3 * FPS  # 時間めじろうを出現させる間隔
+CLASSIC_WAVES = [Wave(0, ENEMY_SPAWN_TICKS, 1, (50, 300), TIMEBIRD_SPAWN_TICKS)]  # 最後まで同じ出方をする元のゲーム
+BEAM_HEADINGS = 360  # ビーム画像をあらかじめ回転させておく向きの数
+BEAM_POOL_SIZE = 512  # 再利用のために取っておくビームの数
+BOMB_POOL_SIZE = 128  # 再利用のために取っておく爆弾の数
+EXPLOSION_POOL_SIZE = 64  # 再利用のために取っておく爆発の数
+PROFILER = Profiler(["events", "input", "spawn", "collide", "update", "sync", "hud", "draw", "flip"],
+                    ["beams", "bombs", "emys", "tbirds", "exps"])  # F3キーで統計を表示する
+ASSETS = AssetManager(os.path.dirname(os.path.abspath(__file__)))  # 画像は全てここから取得する（パスはこのファイルからの相対）
 
 def check_bound(obj_rct: pg.Rect) -> tuple[bool, bool]:
     """
@@ -36,38 +67,149 @@ def calc_orientation(org: pg.Rect, dst: pg.Rect) -> tuple[float, float]:
     return x_diff/norm, y_diff/norm
 
 
-class Start:
+def mask_of(sprite: pg.sprite.Sprite) -> pg.Mask:
+    """
+    スプライトの当たり判定用のマスクを返す（画像と矩形の大きさごとにASSETSにキャッシュされる）
+    画像は矩形の左上に描かれるので，矩形からはみ出して描かれた部分はマスクに含めない
+    引数 sprite：画像と矩形を持つスプライト
+    戻り値：マスク
+    """
+    return ASSETS.mask_of(sprite.image, sprite.rect.size)
+
+
+class StartupStats:
+    """
+    起動の速さ（最初の画面が出るまで・Enterキーからゲーム画面が出るまで）を計るクラス
+    """
+    def __init__(self):
+        self.t0 = time.perf_counter()  # 計測の起点
+        self.first_frame_ms: float | None = None  # 最初の画面が出るまでの時間
+        self.load_ms: float | None = None  # 裏での画像の準備にかかった時間
+        self.pressed_at: float | None = None  # Enterキーが押された時刻
+        self.start_delays_ms: list[float] = []  # Enterキーからゲーム画面が出るまでの時間（ゲームごと）
+
+    def frame_shown(self):
+        """
+        画面を表示したときに呼ぶ（最初の1回だけ記録する）
+        """
+        if self.first_frame_ms is None:
+            self.first_frame_ms = (time.perf_counter() - self.t0) * 1000
+
+    def game_shown(self):
+        """
+        ゲーム画面を表示したときに呼ぶ（Enterキーの後の最初の1回だけ記録する）
+        """
+        if self.pressed_at is not None:
+            self.start_delays_ms.append((time.perf_counter() - self.pressed_at) * 1000)
+            self.pressed_at = None
+
+    def report(self):
+        """
+        計測結果を表示する
+        """
+        def fmt(ms: float | None) -> str:
+            return "-" if ms is None else f"{ms:.1f} ms"
+        print(f"first frame: {fmt(self.first_frame_ms)}")
+        print(f"asset preload: {fmt(self.load_ms)}")
+        for i, ms in enumerate(self.start_delays_ms, 1):
+            print(f"ENTER -> game #{i}: {fmt(ms)}")
+
+
+class Start(Scene):
     """
     スタート画面を表示するクラス。
     背景に指定画像を表示し、Enterキーでスタートする。
-
+    ゲームの画像は裏のスレッドで準備し，終わるまでは進み具合のバーを表示する。
+    準備が終わった後は画面が動かないので，入力を待つ間はCPUを使わずに眠る。
     """
-    def __init__(self, screen: pg.Surface):
-        self.screen = screen
-        self.bg_img = pg.image.load("fig/vs.jpg")  # アップロード画像を読み込む
-        self.bg_img = pg.transform.scale(self.bg_img, (WIDTH, HEIGHT))  # 画面サイズにリサイズ
+    def __init__(self, view: Viewport, new_game: Callable[[], Scene],
+                 stats: StartupStats | None = None):
+        """
+        引数1 view：描画先
+        引数2 new_game：Enterキーで始めるゲームの場面を作る関数
+        引数3 stats：起動時間の計測先
+        """
+        self.view = view
+        self.screen = view.surface
+        self.new_game = new_game
+        self.stats = stats
+        self.preloader: Preloader | None = None  # ゲームの画像を準備中のPreloader
+        self.bg_img = None  # 背景画像（load_bgで読み込むまでは黒）
         self.font = pg.font.Font(None, 60)
-        self.text = self.font.render("Press ENTER to Start", True, (255, 0, 0))
-        self.text_rect = self.text.get_rect(center=(WIDTH // 2, HEIGHT - 100))
-
-    def run(self):
-        while True:
-            self.screen.blit(self.bg_img, (0, 0))
-            self.screen.blit(self.text, self.text_rect)
-            pg.display.update()
-
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    pg.quit()
-                    sys.exit()
-                if event.type == pg.KEYDOWN and event.key == pg.K_RETURN:
-                    return
+        text = self.font.render("Press ENTER to Start", True, (255, 0, 0))
+        self.text_pos = view.pos(text.get_rect(center=(WIDTH // 2, HEIGHT - 100)))
+        self.text = view.image(text)
+        bar_rect = pg.Rect(0, 0, WIDTH // 2, 12)  # 準備の進み具合のバー
+        bar_rect.center = (WIDTH // 2, HEIGHT - 50)
+        self.bar_rect = view.rect(bar_rect)
+        self.started = False
+
+    def load_bg(self):
+        """
+        背景画像を読み込み，描画の内部解像度にリサイズする（Preloaderの最初の仕事として裏で実行する）
+        """
+        self.bg_img = pg.transform.scale(ASSETS.load("fig/vs.jpg"), self.view.size)
 
+    def preload(self, jobs: list[Callable[[], object]]):
+        """
+        背景画像とjobsの準備を裏のスレッドで始める
+        引数 jobs：背景画像の後に実行する仕事のリスト
+        """
+        self.preloader = Preloader([self.load_bg] + jobs).start()
 
-class Bird(pg.sprite.Sprite):
+    @property
+    def loading(self) -> bool:
+        """
+        画像を準備中かどうか
+        """
+        return self.preloader is not None and not self.preloader.finished
+
+    def enter(self):
+        self.started = False
+        self.draw()
+
+    def wait_ms(self) -> int:
+        if self.loading:
+            return 30  # 進み具合のバーを描き直す
+        return 500  # 入力が無くても時々起きて描き直す
+
+    def handle(self, event: pg.event.Event):
+        if event.type == pg.KEYDOWN and event.key == pg.K_RETURN:
+            self.started = True
+            if self.stats is not None:
+                self.stats.pressed_at = time.perf_counter()
+
+    def update(self) -> Scene:
+        if self.preloader is not None and self.preloader.finished:
+            self.preloader.join()  # 準備中に起きた例外はここで投げ直す
+            if self.stats is not None:
+                self.stats.load_ms = self.preloader.elapsed * 1000
+            self.preloader = None
+        if self.started and not self.loading:  # 準備中に押されたら終わり次第始める
+            return self.new_game()
+        return self
+
+    def draw(self):
+        if self.bg_img is None:
+            self.screen.fill((0, 0, 0))
+        else:
+            self.screen.blit(self.bg_img, (0, 0))
+        self.screen.blit(self.text, self.text_pos)
+        if self.loading:
+            pg.draw.rect(self.screen, (255, 255, 255), self.bar_rect, 1)
+            done = self.bar_rect.copy()
+            done.width = int(done.width * self.preloader.progress)
+            pg.draw.rect(self.screen, (255, 0, 0), done)
+        self.view.present()
+        if self.stats is not None:
+            self.stats.frame_shown()
+
+
+class Bird(pg.sprite.DirtySprite):
     """
     ゲームキャラクター（めじろう）に関するクラス
     """
+    _layer = 0  # 差分描画での重なり順（小さいほど奥）
     delta = {  # 押下キーと移動量の辞書
         pg.K_UP: (0, -1),
         pg.K_DOWN: (0, +1),
@@ -81,37 +223,44 @@ class Bird(pg.sprite.Sprite):
         引数2 xy：めじろう画像の位置座標タプル
         """
         super().__init__()
-        img0 = pg.transform.rotozoom(pg.image.load(f"fig/mejirou.png"), 0, 0.05)
-        img = pg.transform.flip(img0, True, False)  # デフォルトのめじろう
-        self.imgs = {
-            (+1, 0): img,  # 右
-            (+1, -1): pg.transform.rotozoom(img, 45, 0.9),  # 右上
-            (0, -1): pg.transform.rotozoom(img, 90, 0.9),  # 上
-            (-1, -1): pg.transform.rotozoom(img0, -45, 0.9),  # 左上
-            (-1, 0): img0,  # 左
-            (-1, +1): pg.transform.rotozoom(img0, 45, 0.9),  # 左下
-            (0, +1): pg.transform.rotozoom(img, -90, 0.9),  # 下
-            (+1, +1): pg.transform.rotozoom(img, -45, 0.9),  # 右下
-        }
+        self.imgs = __class__.load_imgs()
         self.dire = (+1, 0)
         self.image = self.imgs[self.dire]
         self.rect = self.image.get_rect()
         self.rect.center = xy
         self.speed = 10
 
-    def change_img(self, num: int, screen: pg.Surface):
+    @staticmethod
+    def load_imgs() -> dict[tuple[int, int], pg.Surface]:
         """
-        めじろう画像を切り替え，画面に転送する
-        引数2 screen：画面Surface
+        向きごとのめじろう画像を用意する
+        戻り値：移動方向をキー，画像Surfaceを値とする辞書
         """
-        self.image = pg.transform.rotozoom(pg.image.load(f"fig/mejirou.png"), 0, 0.05)
-        screen.blit(self.image, self.rect)
+        path, s = "fig/mejirou.png", 0.05
+        img0 = ASSETS.get(path, 0, s)
+        img = ASSETS.get(path, 0, s, (True, False))  # デフォルトのめじろう
+        return {
+            (+1, 0): img,  # 右
+            (+1, -1): ASSETS.get(path, 45, s*0.9, (True, False)),  # 右上
+            (0, -1): ASSETS.get(path, 90, s*0.9, (True, False)),  # 上
+            (-1, -1): ASSETS.get(path, -45, s*0.9),  # 左上
+            (-1, 0): img0,  # 左
+            (-1, +1): ASSETS.get(path, 45, s*0.9),  # 左下
+            (0, +1): ASSETS.get(path, -90, s*0.9, (True, False)),  # 下
+            (+1, +1): ASSETS.get(path, -45, s*0.9, (True, False)),  # 右下
+        }
 
-    def update(self, key_lst: list[bool], screen: pg.Surface):
+    def change_img(self, num: int):
+        """
+        めじろう画像を切り替える（画面への転送はRendererが行う）
+        """
+        self.image = ASSETS.get("fig/mejirou.png", 0, 0.05)
+        self.dirty = 1
+
+    def update(self, key_lst: list[bool]):
         """
         押下キーに応じてめじろうを移動させる
-        引数1 key_lst：押下キーの真理値リスト
-        引数2 screen：画面Surface
+        引数 key_lst：押下キーの真理値リスト
         """
         sum_mv = [0, 0]
         for k, mv in __class__.delta.items():
@@ -124,97 +273,134 @@ class Bird(pg.sprite.Sprite):
         if not (sum_mv[0] == 0 and sum_mv[1] == 0):
             self.dire = tuple(sum_mv)
             self.image = self.imgs[self.dire]
-        screen.blit(self.image, self.rect)
+            self.dirty = 1
 
 
-class Bomb(pg.sprite.Sprite):
+class Bomb(PooledSprite, pg.sprite.DirtySprite):
     """
-    爆弾に関するクラス
+    爆弾に関するクラス（BOMB_POOLから借りて使い回す）
     """
+    __slots__ = ("img", "image", "rect", "score_value", "vx", "vy", "speed", "slot", "pool")
+    _layer = 4
     colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)]
-    imgs = [pg.image.load(f"fig/{i}.png") for i in range(0, 5)]  # ランダムで画像を選ぶ
+    imgs = [f"fig/{i}.png" for i in range(0, 5)]  # ランダムで画像を選ぶ
+    scales = (1.3, 2.2)  # 倍率の範囲
     
-    def __init__(self, num: int, emy: "Enemy", bird: Bird):
+    def __init__(self, num: int, emy: "Enemy", bird: Bird, rng: random.Random | None = None,
+                 tuning: "Tuning | None" = None):
         """
         爆弾こうかとんSurfaceを生成する
         引数1 emy：爆弾を投下するこうかとん
         引数2 bird：攻撃対象のめいじろう
+        引数3 rng：乱数生成器（Noneならrandomモジュール）
+        引数4 tuning：倍率・速さ・得点の設定（NoneならDEFAULT_TUNING）
         """
         super().__init__()
-        img2 = pg.transform.rotozoom(pg.image.load(f"fig/{num}.png"), 0, 0.9)
-        self.img = pg.transform.flip(img2, True, False)  # デフォルトのこうかとん
+        self.pool = None
+        self.reset(num, emy, bird, rng, tuning)
+
+    def reset(self, num: int, emy: "Enemy", bird: Bird, rng: random.Random | None = None,
+              tuning: "Tuning | None" = None):
+        """
+        再利用のために，__init__と同じ引数で爆弾を初期化し直す
+        """
+        rng = rng or random
+        tuning = tuning or DEFAULT_TUNING
+        self.img = ASSETS.get(f"fig/{num}.png", 0, 0.9, (True, False))  # デフォルトのこうかとん
         self.image = self.img
         self.rect = self.img.get_rect()
         # 爆弾を投下するemyから見た攻撃対象のbirdの方向を計算
-        base_img = random.choice(__class__.imgs)
-        scale =random.uniform(1.3, 2.2)  # ランダムで倍率を決める
-        self.image = pg.transform.rotozoom(base_img, 0, scale)
+        base_img = rng.choice(__class__.imgs)
+        scale = quantize_scale(rng.uniform(*tuning.bomb_scales))  # ランダムで倍率を決める
+        self.image = ASSETS.get(base_img, 0, scale)
 
         area = self.rect.width * self.rect.height
-        self.score_value = max(1, area // 100)
+        self.score_value = max(1, area // tuning.area_per_point)
         self.vx, self.vy = calc_orientation(emy.rect, bird.rect)  
         self.rect.centerx = emy.rect.centerx
         self.rect.centery = emy.rect.centery+emy.rect.height//2
-        self.speed = 6
-
-    def update(self):
-        """
-        爆弾を速度ベクトルself.vx, self.vyに基づき移動させる
-        引数 screen：画面Surface
-        """
-        self.rect.move_ip(self.speed*self.vx, self.speed*self.vy)
-        if check_bound(self.rect) != (True, True):
-            self.kill()
+        self.speed = tuning.bomb_speed
+        self.dirty = 2  # 毎フレーム移動するので常に描き直す
+        # 移動と画面外判定はProjectileEngineが速度ベクトルself.vx, self.vyに基づきまとめて行う
 
 
 
-class Beam(pg.sprite.Sprite):
+class Beam(PooledSprite, pg.sprite.DirtySprite):
     """
-    ビームに関するクラス
+    ビームに関するクラス（BEAM_POOLから借りて使い回す）
     """
-    def __init__(self, bird: Bird,angle:float | None = None):
+    __slots__ = ("image", "rect", "vx", "vy", "speed", "slot", "pool")
+    _layer = 1
+    table: RotationTable | None = None  # 回転済みビーム画像と方向ベクトルの表
+
+    @classmethod
+    def build_table(cls, resolution: int = BEAM_HEADINGS) -> RotationTable:
+        """
+        ビーム画像をresolution方向に回転させた表を作る
+        引数 resolution：向きの数
+        戻り値：作成した表
+        """
+        cls.table = RotationTable(ASSETS.load("fig/beam.png"), resolution)
+        return cls.table
+
+    def __init__(self, bird: Bird,angle:float | None = None, heading: int | None = None):
         """
         ビーム画像Surfaceを生成する
-        引数 bird：ビームを放つめじろう
+        引数1 bird：ビームを放つめじろう
+        引数2 angle：発射角度（度）
+        引数3 heading：表の向きの番号（angleより優先）
         """
         super().__init__()
-        if angle is None:  # 角度が指定されていないとき
+        self.pool = None
+        self.reset(bird, angle, heading)
+
+    def reset(self, bird: Bird,angle:float | None = None, heading: int | None = None):
+        """
+        再利用のために，__init__と同じ引数でビームを初期化し直す
+        """
+        table = __class__.table or __class__.build_table()
+        if heading is not None:
+            self.vx, self.vy = table.vecs[heading]
+        elif angle is None:  # 角度が指定されていないとき
             dx,dy = bird.dire  # めいじろうの向き取得
-            angle = math.degrees(math.atan2(-dy, dx))  # めいじろうの向きから角度を計算
+            heading = table.index_of(dx, dy)  # めいじろうの向きに対応する表の番号
             self.vx, self.vy = dx,dy  # ビームの移動方向をセット
         else:
-            self.vx = math.cos(math.radians(angle))  # x方向の速度
-            self.vy = -math.sin(math.radians(angle))  # y方向の速度
-        self.image = pg.transform.rotozoom(pg.image.load("fig/beam.png"),angle,1.0)  # ビームの画像を角度に合わせて回転
+            heading = table.index(angle)
+            self.vx, self.vy = table.vecs[heading]
+        self.image = table.imgs[heading]  # 角度に合わせて回転済みのビーム画像
         self.rect = self.image.get_rect()
         self.rect.centerx = bird.rect.centerx + bird.rect.width * self.vx  # ビームの初期x座標の調整
         self.rect.centery = bird.rect.centery + bird.rect.height * self.vy  # ビームの初期y座標の調整
         self.speed = 12  # ビームの移動速度
-        
-
-    def update(self):
-        """
-        ビームを速度ベクトルself.vx, self.vyに基づき移動させる
-        引数 screen：画面Surface
-        """
-        self.rect.move_ip(self.speed*self.vx, self.speed*self.vy)
-        if check_bound(self.rect) != (True, True):  # 画面外に出たら
-            self.kill()  # ビームを削除
+        self.dirty = 2  # 毎フレーム移動するので常に描き直す
+        # 移動と画面外判定はProjectileEngineが速度ベクトルself.vx, self.vyに基づきまとめて行う
 
 
-class Explosion(pg.sprite.Sprite):
+class Explosion(PooledSprite, pg.sprite.DirtySprite):
     """
-    爆発に関するクラス
+    爆発に関するクラス（EXPLOSION_POOLから借りて使い回す）
     """
-    def __init__(self, obj: "Bomb|Enemy", life: int):
+    __slots__ = ("imgs", "image", "rect", "life", "pool")
+    _layer = 5
+    def __init__(self, obj: "Bomb|Enemy", life: int, animate: bool = True):
         """
         爆弾が爆発するエフェクトを生成する
         引数1 obj：爆発するBombまたは敵機インスタンス
         引数2 life：爆発時間
+        引数3 animate：画像を反転させて切り替えるアニメーションをするかどうか
         """
         super().__init__()
-        img = pg.image.load(f"fig/explosion.gif")
-        self.imgs = [img, pg.transform.flip(img, 1, 1)]
+        self.pool = None
+        self.reset(obj, life, animate)
+
+    def reset(self, obj: "Bomb|Enemy", life: int, animate: bool = True):
+        """
+        再利用のために，__init__と同じ引数で爆発を初期化し直す
+        """
+        self.dirty = 1
+        img = ASSETS.get("fig/explosion.gif")
+        self.imgs = [img, ASSETS.get("fig/explosion.gif", flip=(True, True)) if animate else img]
         self.image = self.imgs[0]
         self.rect = self.image.get_rect(center=obj.rect.center)
         self.life = life
@@ -225,31 +411,45 @@ class Explosion(pg.sprite.Sprite):
         爆発エフェクトを表現する
         """
         self.life -= 1
-        self.image = self.imgs[self.life//10%2]
+        img = self.imgs[self.life//10%2]
+        if img is not self.image:  # 画像が切り替わったときだけ描き直す
+            self.image = img
+            self.dirty = 1
         if self.life < 0:
             self.kill()
 
 
-class Enemy(pg.sprite.Sprite):
+class Enemy(pg.sprite.DirtySprite):
     """
     敵機に関するクラス
     """
-    imgs = [pg.image.load(f"fig/{i}.png") for i in range(0, 5)]  # ランダムで画像を選ぶ
+    _layer = 3
+    imgs = [f"fig/{i}.png" for i in range(0, 5)]  # ランダムで画像を選ぶ
+    scales = (1.5, 2.8)  # 倍率の範囲
     
-    def __init__(self):
+    def __init__(self, rng: random.Random | None = None, bomb_interval: tuple[int, int] = (50, 300),
+                 tuning: "Tuning | None" = None):
+        """
+        引数1 rng：乱数生成器（Noneならrandomモジュール）
+        引数2 bomb_interval：爆弾投下インターバル（ティック数）の範囲
+        引数3 tuning：倍率・得点の設定（NoneならDEFAULT_TUNING）
+        """
         super().__init__()
-        base_img = random.choice(__class__.imgs)
-        scale =random.uniform(1.5, 2.8)  # ランダムで倍率を決める
-        self.image = pg.transform.rotozoom(base_img, 0, scale)
+        rng = rng or random
+        tuning = tuning or DEFAULT_TUNING
+        base_img = rng.choice(__class__.imgs)
+        scale = quantize_scale(rng.uniform(*tuning.enemy_scales))  # ランダムで倍率を決める
+        self.image = ASSETS.get(base_img, 0, scale)
         self.rect = self.image.get_rect()
-        self.rect.center = random.randint(0, WIDTH), 0
+        self.rect.center = rng.randint(0, WIDTH), 0
         self.vx, self.vy = 0, +6
-        self.bound = random.randint(50, HEIGHT//2)  # 停止位置
+        self.bound = rng.randint(50, HEIGHT//2)  # 停止位置
         self.state = "down"  # 降下状態or停止状態
-        self.interval = random.randint(50, 300)  # 爆弾投下インターバル
+        self.interval = rng.randint(*bomb_interval)  # 爆弾投下インターバル
+        self.on_stop: Callable[["Enemy"], None] | None = None  # 停止状態になったときに呼ぶ関数
 
         area = self.rect.width *self.rect.height
-        self.score_value = max(1, area // 100)
+        self.score_value = max(1, area // tuning.area_per_point)
 
         
     def update(self):
@@ -260,69 +460,114 @@ class Enemy(pg.sprite.Sprite):
         """
         if self.rect.centery > self.bound:
             self.vy = 0
-            self.state = "stop"
-        self.rect.move_ip(self.vx, self.vy)
+            if self.state != "stop":
+                self.state = "stop"
+                if self.on_stop is not None:
+                    self.on_stop(self)
+        if self.vx or self.vy:
+            self.rect.move_ip(self.vx, self.vy)
+            self.dirty = 1
 
 
-class Score:
+class Score(pg.sprite.DirtySprite):
     """
     打ち落とした爆弾，敵機の数をスコアとして表示するクラス
     爆弾：1点
     敵機：10点
     """
+    _layer = 6
+    
     def __init__(self):
+        super().__init__()
         self.font = pg.font.Font(None, 50)
         self.color = (0, 0, 255)
         self.value = 0
-        self.image = self.font.render(f"Score: {self.value}", 0, self.color)
+        self.label = CachedLabel(self.font, self.color, "Score: ", False)  # 点数が変わったときだけ描き直す
+        self.label.set(self.value)
+        self.image = self.label.image
         self.rect = self.image.get_rect()
         self.rect.center = 100, HEIGHT-50
 
+    def refresh(self):
+        """
+        点数が変わっていればスコアの画像を作り直す
+        """
+        if self.label.set(self.value):
+            self.image = self.label.image
+            self.rect.size = self.image.get_size()
+            self.dirty = 1
+
     def update(self, screen: pg.Surface):
-        self.image = self.font.render(f"Score: {self.value}", 0, self.color)
+        self.refresh()
         screen.blit(self.image, self.rect)
 
-class Time:
+class Time(pg.sprite.DirtySprite):
+    """
+    残り時間を表示するクラス
+    経過時間は実時間ではなくtick()が呼ばれた回数（ティック数）で数える
+    """
+    _layer = 6
+
     def __init__(self, total_time=60):
-        self.start_ticks = pg.time.get_ticks()
+        super().__init__()
+        self.ticks = 0  # 経過ティック数
         self.total_time = total_time
         self.font = pg.font.Font(None, 100)
         self.color = (255, 255, 255)
         self.rect = pg.Rect(30,30,100,50)
+        self.label = CachedLabel(self.font, self.color)  # 残り秒数が変わったときだけ描き直す
+        self.image = self.label.image
+        self.time_left = total_time  # tickで1ティックに1回だけ計算した残り時間
 
     def get_time_left(self):
-        elapsed_sec = (pg.time.get_ticks() - self.start_ticks) // 1000
+        elapsed_sec = self.ticks // FPS
         return max(0, self.total_time - elapsed_sec)
 
+    def tick(self):
+        """
+        1ティック進めて残り時間を計算し直す
+        """
+        self.ticks += 1
+        self.time_left = self.get_time_left()
+
+    def refresh(self):
+        """
+        残り秒数が変わっていれば画像を作り直す
+        """
+        if self.label.set(self.time_left):
+            self.image = self.label.image
+            self.rect.size = self.image.get_size()
+            self.dirty = 1
+
     def update(self, screen: pg.Surface):
-        time_left = self.get_time_left()
-        txt = self.font.render(f"{time_left}", True, self.color)
-        screen.blit(txt, self.rect)
+        self.refresh()
+        screen.blit(self.image, self.rect)
 
     def is_time_over(self):
-        return self.get_time_left() <= 0
+        return self.time_left <= 0  # 直前のtickで計算した残り時間で判定
 
 
-class TimeBird(pg.sprite.Sprite):
+class TimeBird(pg.sprite.DirtySprite):
     """
     時間増減用のめじろう（2: +2秒, 3: -5秒）を表すクラス
     """
-    def __init__(self, kind: int):
+    _layer = 2
+    def __init__(self, kind: int, rng: random.Random | None = None):
+        """
+        引数1 kind：めじろうの種類（2 or 3）
+        引数2 rng：乱数生成器（Noneならrandomモジュール）
+        """
         super().__init__()
+        rng = rng or random
         self.kind = kind  # 2 or 3
         img_path = f"fig/mejirou{kind}.png"
-        self.image = pg.transform.rotozoom(pg.image.load(img_path), 0, 0.05)
+        self.image = ASSETS.get(img_path, 0, 0.05)
         self.rect = self.image.get_rect()
         self.rect.center = (
-            random.randint(50, WIDTH - 50),
-            random.randint(50, HEIGHT - 50)
+            rng.randint(50, WIDTH - 50),
+            rng.randint(50, HEIGHT - 50)
         )
-        self.spawn_time = pg.time.get_ticks()
-
-    def update(self):
-        # 出現から5秒経過で自動消滅
-        if (pg.time.get_ticks() - self.spawn_time) >= 5000:
-            self.kill()
+        self.life = 5 * FPS  # 出現から消えるまでのティック数（消すのはGameStateの予定）
 
 
 
@@ -341,19 +586,30 @@ class NeoBeam:
         ビーム角度をずらしながら Beam インスタンスをリストで返す
         """
 
-        step = 360 / self.num 
-        return [Beam(self.bird, angle) 
-                for angle in (i * step for i in range(self.num))] # i を 0〜(self.num-1) まで増やし、step をかけて angle を求める
+        table = Beam.table or Beam.build_table()
+        return [BEAM_POOL.acquire(self.bird, heading=h)
+                for h in table.spread(self.num)]  # 全周をnum等分した向きの番号を表から引く
+
+BEAM_POOL = Pool(Beam, BEAM_POOL_SIZE)
+BOMB_POOL = Pool(Bomb, BOMB_POOL_SIZE)
+EXPLOSION_POOL = Pool(Explosion, EXPLOSION_POOL_SIZE)
 
-class Skill:
+
+class Skill(pg.sprite.DirtySprite):
     """
     敵を倒すとスキルゲージがたまり、拡散ビームを打つ
     """
+    _layer = 6
+
     def __init__(self,max_value: int = 5):
+        super().__init__()
         self.value = 0 
         self.max = max_value  # 最大スキルポイント
         self.bar_area = pg.Rect(WIDTH-250,HEIGHT-40,200,15)  # スキルゲージを表示するための長方形
         self.font = pg.font.Font(None,30)  # スキルゲージの文字フォント
+        self.rect = pg.Rect(self.bar_area.x, self.bar_area.y-22, self.bar_area.width, self.bar_area.height+22)  # 文字とゲージを合わせた領域
+        self.imgs: dict[int, pg.Surface] = {}  # スキルポイントごとに描画済みのゲージ画像
+        self.image = self.render(self.value)
 
     def add(self,n:int = 1):  # 増やすスキルポイント 敵を倒した際のスキルポイント
         self.value = min(self.max,self.value + n)  # 最大値を超えないように加算
@@ -364,13 +620,38 @@ class Skill:
     def consume(self):
         self.value = 0  # スキルを使った際スキルポイントを0にする
 
+    def render(self, value: int) -> pg.Surface:
+        """
+        スキルポイントvalueのゲージ画像を返す（値ごとに一度だけ描画してキャッシュする）
+        引数 value：スキルポイント
+        戻り値：枠・中身・文字を描いたゲージ画像
+        """
+        img = self.imgs.get(value)
+        if img is not None:
+            return img
+        img = pg.Surface(self.rect.size, pg.SRCALPHA)
+        bar_area = self.bar_area.move(-self.rect.x, -self.rect.y)  # 画像の左上を原点とした位置
+        pg.draw.rect(img, (255,0,0),bar_area,2)  # ゲージの枠（レッド）を描く
+        inner = bar_area.copy()  # 枠と同じサイズの中身を作成
+        inner.width = bar_area.width*value/self.max  # ゲージの中身の長さを現在の値に応じて設定
+        pg.draw.rect(img,(255,215,0),inner)  # ゲージの中身の色を描画
+        txt = self.font.render(f"skill{value}/{self.max}" ,True,(255,215,0))  # ゲージ上部に表示するテキストを描画（例：skill 3/5）
+        img.blit(txt,(bar_area.x,bar_area.y -22))  # テキストをゲージの上に表示
+        self.imgs[value] = img
+        return img
+
+    def refresh(self):
+        """
+        スキルポイントが変わっていればゲージ画像を差し替える
+        """
+        img = self.render(self.value)
+        if img is not self.image:
+            self.image = img
+            self.dirty = 1
+
     def draw(self, screen: pg.Surface):  # スキルゲージを画面に描画する処理
-        pg.draw.rect(screen, (255,0,0),self.bar_area,2)  # ゲージの枠（レッド）を描く
-        inner = self.bar_area.copy()  # 枠と同じサイズの中身を作成
-        inner.width = self.bar_area.width*self.value/self.max  # ゲージの中身の長さを現在の値に応じて設定
-        pg.draw.rect(screen,(255,215,0),inner)  # ゲージの中身の色を描画
-        txt = self.font.render(f"skill{self.value}/{self.max}" ,True,(255,215,0))  # ゲージ上部に表示するテキストを描画（例：skill 3/5）
-        screen.blit(txt,(self.bar_area.x,self.bar_area.y -22))  # テキストをゲージの上に表示
+        self.refresh()
+        screen.blit(self.image, self.rect)
 
 
 # def main():
@@ -379,145 +660,860 @@ class Skill:
     # bg_img = pg.image.load(f"fig/haikei.png")
     # score = Score()
 
-def main():
-    pg.display.set_caption("詰む積む")
-    screen = pg.display.set_mode((WIDTH, HEIGHT))
-
-    # スタート画面の表示
-    start = Start(screen)
-    start.run()
-
-    # 以下、ゲーム処理に進む…
-    bg_img = pg.image.load(f"fig/haikei.png")
-    score = Score()
-    time_birds = pg.sprite.Group()
-    timer = Time(60)  # 60秒スタートのタイマー  
-    skill = Skill()
-
-    bird = Bird(3, (900, 400))
-    bombs = pg.sprite.Group()
-    beams = pg.sprite.Group()
-    exps = pg.sprite.Group()
-    emys = pg.sprite.Group()
-
-
-    tmr = 0
-    clock = pg.time.Clock()        
-    while True:
-        key_lst = pg.key.get_pressed()
-        for event in pg.event.get():
-            if event.type == pg.QUIT:
-                return 0
-            if event.type == pg.KEYDOWN: # スペースキーが押されたら
-                if event.key == pg.K_RETURN and  skill.ready(): # スキルゲージが満タンなら Enterキーで発動
-                    for b in NeoBeam(bird, num = 32).gen_beams():   # 32方向にビームを放つ
-                        beams.add(b) # 各ビームをビームグループに追加
-                    skill.consume() # スキルゲージを消費
-                elif event.key == pg.K_SPACE: #スキルゲージがたまっていなければ
-                    beams.add(Beam(bird)) # 通常ビームを1発だけ追加
-
-        screen.blit(bg_img, [0, 0])
-        if tmr%200 == 0:  # 200フレームに1回，敵機を出現させる
-            emys.add(Enemy())
-
-        for emy in emys:
-            if emy.state == "stop" and tmr%emy.interval == 0:
-                # 敵機が停止状態に入ったら，intervalに応じて爆弾投下
-                bombs.add(Bomb(3, emy, bird))
-        if tmr%150 == 0:  # 約〇秒ごと（50fps基準）
-            kind = random.choice([2, 3])
-            time_birds.add(TimeBird(kind))
-        # for emy in emys:
-        #     if emy.state == "stop" and tmr%emy.interval == 0:
-        #         # 敵機が停止状態に入ったら，intervalに応じて爆弾投下
-        #         bombs.add(Bomb(emy, bird))
-
-
-        # for emy in emys:
-        #     if emy.state == "stop" and tmr%emy.interval == 0:
-        #         # 敵機が停止状態に入ったら，intervalに応じて爆弾投下
-        #         bombs.add(Bomb(emy, bird))
-
-        # for emy in pg.sprite.groupcollide(emys, beams, True, True).keys():  # ビームと衝突したこうかとんリスト
-        #     exps.add(Explosion(emy, 100))  # 爆発エフェクト
-        #     score.value += emy.score_value  # 点アップ
-        for emy in pg.sprite.groupcollide(emys, beams, True, True).keys():  # ビームと衝突した敵機リスト
-            exps.add(Explosion(emy, 100))  # 爆発エフェクト
-            score.value += emy.score_value  # こうかとんの大きさで点アップ
-            skill.add()
-            bird.change_img(6, screen)  # めじろう喜びエフェクト
-
-        for bomb in pg.sprite.groupcollide(bombs, beams, True, True).keys():  # ビームと衝突した爆弾こうかとんリスト
-            exps.add(Explosion(bomb, 50))  # 爆発エフェクト
-            score.value += bomb.score_value  # 点アップ
-        # for bomb in pg.sprite.groupcollide(bombs, beams, True, True).keys():  # ビームと衝突した爆弾リスト
-        #     exps.add(Explosion(bomb, 50))  # 爆発エフェクト
-        #     score.value += 1  # 1点アップ
-
-        for tbird in pg.sprite.groupcollide(time_birds, beams, True, True).keys():
-            if tbird.kind == 3:
-                timer.total_time += 3
-            elif tbird.kind == 2:
-                timer.total_time -= 5
-
-        # for bird in pg.sprite.groupcollide(time_birds, beams, True, True).keys():
-        #     if bird.kind == 2:
-        #         timer.total_time += 2
-        #     elif bird.kind == 3:
-        #         timer.total_time -= 5
-
-
-        for bomb in pg.sprite.spritecollide(bird, bombs, True):  # めじろうと衝突した爆弾リスト
-            bird.change_img(8, screen)  # めじろう悲しみエフェクト
-            score.update(screen)
-            timer.update(screen)
-            pg.display.update()
-            time.sleep(1)
-            # 終了スコア表示
-            font_big = pg.font.Font(None, 100)
-            font_small = pg.font.Font(None, 60)
-            score_text = font_big.render(f"Score: {score.value}", True, (255, 20, 10))
-            screen.blit(score_text, score_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 50)))
-            pg.display.update()
-            time.sleep(5)
-            return   
+class Tuning(NamedTuple):
+    """
+    難易度と得点の調整値（バランス調整のためにまとめて差し替えられる）
+    """
+    enemy_scales: tuple[float, float] = Enemy.scales  # 敵機の倍率の範囲
+    bomb_scales: tuple[float, float] = Bomb.scales  # 爆弾の倍率の範囲
+    bomb_speed: float = 6  # 爆弾の移動速度
+    skill_max: int = 5  # 拡散ビームを撃てるようになるスキルポイント
+    time_bonus: int = 3  # 時間めじろう（3）を撃ったときに増える秒数
+    time_penalty: int = 5  # 時間めじろう（2）を撃ったときに減る秒数
+    area_per_point: int = 100  # 敵機・爆弾の面積（画素数）をこの値で割ったものが得点
+
+
+DEFAULT_TUNING = Tuning()
 
-    
 
-        bird.update(key_lst, screen)
-        beams.update()
-        beams.draw(screen)
-        time_birds.update()
-        time_birds.draw(screen)
-
-        emys.update()
-        emys.draw(screen)
-        bombs.update()
-        bombs.draw(screen)
-        exps.update()
-        exps.draw(screen)
-        score.update(screen)
-        timer.update(screen)
-        skill.draw(screen)
-        pg.display.update()
+class Quality(NamedTuple):
+    """
+    処理が重いときに下げる演出の品質の段階（Governorが切り替える）
+    """
+    name: str
+    max_explosions: int | None  # 同時に出す爆発の最大数（Noneなら制限せず，重なった爆発もまとめない）
+    explosion_life: float  # 爆発時間に掛ける割合
+    animate_explosions: bool  # 爆発の画像を反転させて切り替えるかどうか
+    neobeam_num: int  # 拡散ビームの本数（ゲームの展開が変わる）
+
+    def __str__(self) -> str:
+        return self.name
+
+
+QUALITY_LEVELS = [  # 最高品質から順に軽くなる
+    Quality("full", None, 1.0, True, 32),
+    Quality("merge", 24, 1.0, True, 32),  # 爆発の数を抑え，重なった爆発をまとめる
+    Quality("short", 16, 0.5, True, 32),  # 爆発を短くする
+    Quality("static", 12, 0.5, False, 32),  # 爆発のアニメーションをやめる
+    Quality("lean", 8, 0.3, False, 16),  # 拡散ビームを減らす
+]
+COSMETIC_LEVELS = 4  # QUALITY_LEVELSのうち見た目だけを変える（入力を記録しても再生がずれない）段階の数
+# ティックごとの記録の列（ティック番号，スプライト数，点数，残り秒数，スキルポイント，そのティックを進めたフレームの処理時間，演出の品質の段階）
+TELEMETRY_COLUMNS = ([("tick", "I")] + [(name, "H") for name in PROFILER.counters] +
+                     [("score", "i"), ("time_left", "h"), ("skill", "B"), ("frame_ms", "f"), ("quality", "B")])
+
+
+class Inputs(NamedTuple):
+    """
+    1ティック分のプレイヤー入力
+    """
+    keys: "Sequence[bool] | Mapping[int, bool]"  # 押され続けているキー（pg.key.get_pressed()の結果など）
+    pressed: tuple[int, ...] = ()  # このティックで新たに押されたキー（KEYDOWN）
+
+    @classmethod
+    def make(cls, held: Iterable[int] = (), pressed: Iterable[int] = ()) -> "Inputs":
+        """
+        キー番号の並びから入力を作る（画面の無いシミュレーション用）
+        引数1 held：押され続けているキー
+        引数2 pressed：このティックで押されたキー
+        """
+        return cls(defaultdict(bool, {k: True for k in held}), tuple(pressed))
+
+
+class GameState:
+    """
+    ゲームの状態を保持し，step()で1ティックずつ進めるクラス
+    乱数はシード付きの乱数生成器，時間はティック数で数えるので，
+    画面が無くても同じシードと入力から同じ結果が得られる
+    """
+    def __init__(self, seed: int | None = None, total_time: int = 60, precise: bool = False,
+                 waves: list[Wave] | None = None, tuning: Tuning | None = None):
+        """
+        引数1 seed：乱数のシード（Noneなら毎回異なる）
+        引数2 total_time：制限時間（秒）
+        引数3 precise：Trueなら矩形が重なった組だけを画素単位（マスク）で調べ直し，透明な部分では当たらない
+        引数4 waves：ウェーブ表（Noneなら最後まで同じ出方をするCLASSIC_WAVES）
+        引数5 tuning：難易度と得点の調整値（NoneならDEFAULT_TUNING）
+        """
+        self.seed = seed
+        self.precise = precise
+        self.waves = waves or CLASSIC_WAVES
+        self.tuning = tuning or DEFAULT_TUNING
+        self.quality = QUALITY_LEVELS[0]  # 演出の品質（プレイ中だけGovernorが切り替える）
+        self.rng = random.Random(seed)
+        self.score = Score()
+        self.timer = Time(total_time)  # 60秒スタートのタイマー
+        self.skill = Skill(self.tuning.skill_max)
+        self.bird = Bird(3, (900, 400))
+        self.bombs = pg.sprite.Group()
+        self.beams = pg.sprite.Group()
+        self.exps = pg.sprite.Group()
+        self.emys = pg.sprite.Group()
+        self.time_birds = pg.sprite.Group()
+        # ビームと爆弾の位置・速度は配列でまとめて管理し，グループは描画用に使う
+        self.beam_engine = ProjectileEngine((WIDTH, HEIGHT), 256)
+        self.bomb_engine = ProjectileEngine((WIDTH, HEIGHT), 64)
+        self.grid = SpatialHash()  # ビームと標的の当たり判定用グリッド（弾と標的が多いときだけ使う）
+        self.tmr = 0
+        self.over: str | None = None  # 終了理由（"hit"：爆弾に当たった，"time"：時間切れ）
+        self.on_spawn: Callable[..., None] | None = None  # スプライト追加時に呼ぶ関数（描画用）
+        # 敵機・爆弾・時間めじろうの出現と時間めじろうの消滅は，時刻を決めた予定として実行する
+        self.events = Scheduler()
+        self.wave = -1  # 今のウェーブの番号
+        self.enemies_spawned = 0  # 出現させた敵機の数（同じ時刻の爆弾投下を出現順に行うのに使う）
+        for i, wave in enumerate(self.waves):
+            self.events.at(wave.start, self.start_wave, i, phase=self.PHASE_WAVE)
+
+    # 同じティックの予定の実行順
+    PHASE_WAVE, PHASE_ENEMY, PHASE_BOMB, PHASE_TIMEBIRD, PHASE_EXPIRE = range(5)
+
+    def start_wave(self, i: int):
+        """
+        i番目のウェーブを始め，そのウェーブの敵機と時間めじろうの出現を予定に入れる
+        """
+        self.wave = i
+        self.events.at(self.tmr, self.spawn_enemies, i, phase=self.PHASE_ENEMY)
+        self.events.at(self.tmr, self.spawn_time_bird, i, phase=self.PHASE_TIMEBIRD)
+
+    def spawn_enemies(self, wave: int):
+        """
+        ウェーブwaveの敵機を出現させ，次の出現を予定に入れる（ウェーブが変わっていれば何もしない）
+        """
+        if wave != self.wave:
+            return
+        w = self.waves[wave]
+        for _ in range(w.enemies):
+            self.add_enemy(Enemy(self.rng, w.bomb_interval, self.tuning))
+        self.events.at(self.tmr + w.enemy_every, self.spawn_enemies, wave, phase=self.PHASE_ENEMY)
+
+    def add_enemy(self, emy: Enemy):
+        """
+        敵機を出現させる（停止したら爆弾投下が予定に入る）
+        """
+        emy.order = self.enemies_spawned
+        emy.on_stop = self.enemy_stopped
+        self.enemies_spawned += 1
+        self.spawn(self.emys, emy)
+
+    def enemy_stopped(self, emy: Enemy):
+        """
+        敵機が停止状態になったら，intervalの倍数の次のティックに爆弾投下を予定に入れる
+        """
+        tick = (self.tmr // emy.interval + 1) * emy.interval
+        self.events.at(tick, self.drop_bomb, emy, phase=self.PHASE_BOMB, rank=emy.order)
+
+    def drop_bomb(self, emy: Enemy):
+        """
+        敵機emyに爆弾を投下させ，次の投下を予定に入れる（倒されていれば何もしない）
+        """
+        if not emy.alive():
+            return
+        self.fire(self.bombs, self.bomb_engine, BOMB_POOL.acquire(3, emy, self.bird, self.rng, self.tuning))
+        self.events.at(self.tmr + emy.interval, self.drop_bomb, emy, phase=self.PHASE_BOMB, rank=emy.order)
+
+    def spawn_time_bird(self, wave: int):
+        """
+        時間めじろうを出現させ，消滅と次の出現を予定に入れる（ウェーブが変わっていれば何もしない）
+        """
+        if wave != self.wave:
+            return
+        self.add_time_bird(TimeBird(self.rng.choice([2, 3]), self.rng))
+        self.events.at(self.tmr + self.waves[wave].timebird_every, self.spawn_time_bird, wave,
+                       phase=self.PHASE_TIMEBIRD)
+
+    def add_time_bird(self, tbird: TimeBird):
+        """
+        時間めじろうを出現させ，消滅を予定に入れる
+        """
+        self.spawn(self.time_birds, tbird)
+        # 出現したティックから数えてlifeティック分の更新を終えたら消す
+        self.events.at(self.tmr + tbird.life, tbird.kill, phase=self.PHASE_EXPIRE)
+
+    def explode(self, obj: pg.sprite.Sprite, life: int):
+        """
+        objの位置に爆発を出す（演出の品質に応じて短くしたり，重なった爆発にまとめたり，出さなかったりする）
+        引数1 obj：爆発する敵機や爆弾
+        引数2 life：最高品質での爆発時間
+        """
+        quality = self.quality
+        life = max(1, round(life * quality.explosion_life))
+        if quality.max_explosions is not None:
+            for exp in self.exps:
+                if exp.rect.colliderect(obj.rect):  # 重なる爆発があれば，新しく出さずに長さだけ延ばす
+                    exp.life = max(exp.life, life)
+                    return
+            if len(self.exps) >= quality.max_explosions:
+                return
+        self.spawn(self.exps, EXPLOSION_POOL.acquire(obj, life, quality.animate_explosions))
+
+    def spawn(self, group: pg.sprite.Group, *sprites: pg.sprite.Sprite):
+        """
+        スプライトをグループに追加し，on_spawnが設定されていれば知らせる
+        """
+        group.add(*sprites)
+        if self.on_spawn is not None:
+            self.on_spawn(*sprites)
+
+    def fire(self, group: pg.sprite.Group, engine: ProjectileEngine, *shots: pg.sprite.Sprite):
+        """
+        ビームや爆弾をグループと弾エンジンに追加する
+        """
+        self.spawn(group, *shots)
+        for shot in shots:
+            engine.add(shot, shot.speed*shot.vx, shot.speed*shot.vy)
+
+    def sync_sprites(self, alpha: float = 1.0):
+        """
+        弾エンジンの位置を描画用スプライトに反映する（描画の直前に呼ぶ）
+        引数 alpha：前のティックから今のティックまでのどこを描くか（1なら今のティック）
+        """
+        self.beam_engine.sync(alpha=alpha)
+        self.bomb_engine.sync(alpha=alpha)
+
+    def close(self):
+        """
+        残っているビーム・爆弾・爆発を消してプールに返す（ゲーム終了後に呼ぶ）
+        """
+        self.beam_engine.clear()
+        self.bomb_engine.clear()
+        self.events.clear()
+        for exp in self.exps.sprites():
+            exp.kill()
+
+    def step(self, inputs: Inputs):
+        """
+        入力inputsに従ってゲームを1ティック進める
+        引数 inputs：このティックの入力
+        """
+        if self.over is not None:
+            return
+        bird, skill, score, timer = self.bird, self.skill, self.score, self.timer
+        PROFILER.mark("input")  # 前のティックからの端数はinputに含める
+        for key in inputs.pressed:
+            if key == pg.K_RETURN and  skill.ready(): # スキルゲージが満タンなら Enterキーで発動
+                self.fire(self.beams, self.beam_engine, *NeoBeam(bird, num = self.quality.neobeam_num).gen_beams())   # 32方向にビームを放つ
+                skill.consume() # スキルゲージを消費
+            elif key == pg.K_SPACE: #スキルゲージがたまっていなければ
+                self.fire(self.beams, self.beam_engine, BEAM_POOL.acquire(bird)) # 通常ビームを1発だけ追加
+
+        # このティックに予定された敵機・爆弾・時間めじろうの出現と時間めじろうの消滅
+        self.events.run(self.tmr)
+        PROFILER.mark("spawn")
+
+        # 敵機・爆弾・時間めじろうを優先順に並べ，全ビームとの当たり判定を配列でまとめて行う
+        emys, tbirds = self.emys.sprites(), self.time_birds.sprites()
+        beam_slots, beam_boxes = self.beam_engine.live()
+        bomb_slots, bomb_boxes = self.bomb_engine.live()
+        n_emys, n_bombs = len(emys), len(bomb_slots)
+        shot_mask = target_mask = None
+        if self.precise:  # 矩形が重なった組の分だけスプライトを引いてマスクを取り出す
+            beam_sprites, bomb_sprites = self.beam_engine.sprites, self.bomb_engine.sprites
+
+            def shot_mask(i: int) -> pg.Mask:
+                return mask_of(beam_sprites[beam_slots[i]])
+
+            def target_mask(j: int) -> pg.Mask:
+                if j < n_emys:
+                    return mask_of(emys[j])
+                if j < n_emys + n_bombs:
+                    return mask_of(bomb_sprites[bomb_slots[j - n_emys]])
+                return mask_of(tbirds[j - n_emys - n_bombs])
+        first = first_hits(beam_boxes, np.concatenate([boxes_of(emys), bomb_boxes, boxes_of(tbirds)]),
+                           shot_mask, target_mask, self.grid)
+        for i in beam_slots[first >= 0]:  # 何かに当たったビームを消す
+            self.beam_engine.remove(int(i))
+        for t in np.unique(first[first >= 0]).tolist():
+            if t < n_emys:  # ビームと衝突した敵機
+                emy = emys[t]
+                emy.kill()
+                self.explode(emy, 100)  # 爆発エフェクト
+                score.value += emy.score_value  # こうかとんの大きさで点アップ
+                skill.add()
+                bird.change_img(6)  # めじろう喜びエフェクト
+            elif t < n_emys + n_bombs:  # ビームと衝突した爆弾こうかとん
+                slot = bomb_slots[t - n_emys:t - n_emys + 1]
+                self.bomb_engine.sync(slot)  # 爆発位置を決めるため矩形を最新にする
+                bomb = self.bomb_engine.sprites[slot[0]]
+                self.explode(bomb, 50)  # 爆発エフェクト
+                score.value += bomb.score_value  # 点アップ
+                self.bomb_engine.remove(int(slot[0]))  # 爆弾はここでプールに返る
+            else:  # ビームと衝突した時間めじろう
+                tbird = tbirds[t - n_emys - n_bombs]
+                tbird.kill()
+                if tbird.kind == 3:
+                    timer.total_time += self.tuning.time_bonus
+                elif tbird.kind == 2:
+                    timer.total_time -= self.tuning.time_penalty
+
+        # めじろうと衝突した爆弾（ビームで消えたものは除く）
+        bird_box = boxes_of([bird])
+        ii, jj = overlapping_pairs(bird_box, bomb_boxes)
+        jj = jj[self.bomb_engine.alive[bomb_slots[jj]]]
+        if self.precise:
+            bomb_sprites = self.bomb_engine.sprites
+            jj = jj[refine(np.zeros_like(jj), jj, bird_box, bomb_boxes, lambda i: mask_of(bird),
+                           lambda j: mask_of(bomb_sprites[bomb_slots[j]]))]
+        PROFILER.mark("collide")
+        if len(jj):
+            self.bomb_engine.remove(int(bomb_slots[jj.min()]))
+            bird.change_img(8)  # めじろう悲しみエフェクト
+            self.over = "hit"
+            return
+
+        bird.update(inputs.keys)
+        self.beam_engine.step()
+        self.emys.update()
+        self.bomb_engine.step()
+        self.exps.update()
+        timer.tick()
         if timer.is_time_over():
-        # 終了画面の描画
-            font = pg.font.Font(None, 100)
-            # font_small = pg.font.Font(None, 60)
-            score_text = font.render(f"Score: {score.value}", True, (255, 20, 10))
-            screen.blit(score_text, score_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 50)))
-            pg.display.update()
-            time.sleep(5)
+            self.over = "time"
+        self.tmr += 1
+        PROFILER.mark("update")
+
+    def counts(self) -> tuple[int, int, int, int, int]:
+        """
+        ビーム・爆弾・敵機・時間めじろう・爆発の数を返す
+        """
+        return (len(self.beam_engine), len(self.bomb_engine), len(self.emys),
+                len(self.time_birds), len(self.exps))
+
+
+class Renderer:
+    """
+    GameStateを画面に描画するクラス
+    dirty=Trueなら変化した領域だけを描き直して転送する差分描画，
+    Falseなら毎フレーム背景から全画面を描き直す
+    viewの内部解像度やウィンドウの大きさが論理解像度と異なるときは，縮小済みの画像で
+    内部解像度の画面外Surfaceに全画面を描き直し，viewが1回の拡大縮小でウィンドウに転送する
+    """
+    def __init__(self, view: Viewport, state: GameState, bg_img: pg.Surface, dirty: bool = True):
+        """
+        引数1 view：描画先
+        引数2 state：描画するゲームの状態
+        引数3 bg_img：背景画像
+        引数4 dirty：差分描画を使うかどうか（viewがウィンドウに直接描くときだけ使える）
+        """
+        self.view = view
+        self.screen = screen = view.surface
+        self.state = state
+        self.bg_img = bg_img
+        self.dirty = dirty and view.direct
+        # 差分描画：全スプライトとHUDを重なり順つきで1つのグループにまとめて描く
+        self.render = pg.sprite.LayeredDirty()
+        self.render.clear(screen, bg_img)
+        self.overlay = ProfilerOverlay(PROFILER)  # F3キーで表示する計測結果
+        if self.dirty:
+            self.render.add(state.bird, state.score, state.timer, state.skill, self.overlay)
+            for group in (state.beams, state.time_birds, state.emys, state.bombs, state.exps):
+                self.render.add(*group)
+            state.on_spawn = self.render.add
+            screen.blit(bg_img, [0, 0])
+            view.present()
+
+    def draw(self, alpha: float = 1.0):
+        """
+        現在の状態を画面に描画して転送する
+        引数 alpha：弾の位置を前のティックと今のティックの間で補間する割合（1なら補間しない）
+        """
+        state, screen = self.state, self.screen
+        state.sync_sprites(alpha)
+        PROFILER.mark("sync")
+        if self.dirty:
+            # 移動・変化したスプライトとHUDだけを描き直し，その領域だけを転送する
+            state.score.refresh()
+            state.timer.refresh()
+            state.skill.refresh()
+            self.overlay.refresh()
+            PROFILER.mark("hud")
+            rects = self.render.draw(screen)
+            PROFILER.mark("draw")
+            self.view.present(rects)
+            PROFILER.mark("flip")
+            return
+        if not self.view.direct:
+            self.draw_scaled()
             return
+        screen.blit(self.bg_img, [0, 0])
+        screen.blit(state.bird.image, state.bird.rect)
+        for group in (state.beams, state.time_birds, state.emys, state.bombs, state.exps):
+            group.draw(screen)
+        PROFILER.mark("draw")
+        state.score.update(screen)
+        state.timer.update(screen)
+        state.skill.draw(screen)
+        self.overlay.refresh()
+        if self.overlay.visible:
+            screen.blit(self.overlay.image, self.overlay.rect)
+        PROFILER.mark("hud")
+        self.view.present()
+        PROFILER.mark("flip")
+
+    def draw_scaled(self):
+        """
+        内部解像度の画面外Surfaceに全画面を描き直し，ウィンドウに転送する
+        スプライトの画像はviewで縮小済みのものに差し替え，位置だけを内部解像度に直して1回のblitsで描く
+        """
+        state, view = self.state, self.view
+        image, pos = view.image, view.pos
+        sprites = [state.bird]
+        for group in (state.beams, state.time_birds, state.emys, state.bombs, state.exps):
+            sprites += group.sprites()
+        view.surface.blit(image(self.bg_img), (0, 0))
+        view.surface.blits([(image(s.image), pos(s.rect)) for s in sprites], doreturn=False)
+        PROFILER.mark("draw")
+        state.score.refresh()
+        state.timer.refresh()
+        state.skill.refresh()
+        self.overlay.refresh()
+        hud = [state.score, state.timer, state.skill] + ([self.overlay] if self.overlay.visible else [])
+        view.surface.blits([(image(s.image), pos(s.rect)) for s in hud], doreturn=False)
+        PROFILER.mark("hud")
+        view.present()
+        PROFILER.mark("flip")
+
+    def draw_result(self):
+        """
+        終了画面として最終スコアを大きく表示する
+        """
+        font = pg.font.Font(None, 100)
+        score_text = font.render(f"Score: {self.state.score.value}", True, (255, 20, 10))
+        rect = score_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 50))
+        self.screen.blit(self.view.image(score_text), self.view.pos(rect))
+        self.view.present()
+
+
+def simulate(seed: int | None = None, max_ticks: int | None = None,
+             policy: Callable[[GameState], Inputs] | None = None, precise: bool = False,
+             waves: list[Wave] | None = None, total_time: int = 60, tuning: Tuning | None = None) -> GameState:
+    """
+    画面に描画せず，ゲームが終わるかmax_ticksに達するまで可能な限り速く進める
+    pg.init()済みであること（SDL_VIDEODRIVER=dummyでよい）
+    引数1 seed：乱数のシード
+    引数2 max_ticks：進める最大ティック数（Noneなら終了まで）
+    引数3 policy：状態から入力を決める関数（Noneなら何も操作しない）
+    引数4 precise：画素単位の当たり判定を使うかどうか
+    引数5 waves：ウェーブ表（Noneなら最後まで同じ出方をするCLASSIC_WAVES）
+    引数6 total_time：制限時間（秒）
+    引数7 tuning：難易度と得点の調整値（NoneならDEFAULT_TUNING）
+    戻り値：最後の状態
+    """
+    state = GameState(seed, total_time, precise, waves, tuning)
+    idle = Inputs.make()
+    while state.over is None and (max_ticks is None or state.tmr < max_ticks):
+        state.step(policy(state) if policy is not None else idle)
+    state.close()
+    return state
+
+
+class Playing(Scene):
+    """
+    ゲームをプレイ中の場面
+    シミュレーションはFPSティック/秒の固定刻みで進め，描画はfpsまで可能な限り行う
+    """
+    def __init__(self, view: Viewport, state: GameState, title: Scene,
+                 dirty: bool = True, max_fps: int = MAX_FPS, interpolate: bool = True,
+                 stats: StartupStats | None = None, record_to: str | None = None, adaptive: bool = True,
+                 telemetry_to: str | None = None):
+        """
+        引数1 view：描画先
+        引数2 state：プレイするゲームの状態
+        引数3 title：ゲーム終了後に戻るタイトルの場面
+        引数4 dirty：Trueなら差分描画，Falseなら毎フレーム全画面を描き直す
+        引数5 max_fps：描画の最大フレームレート（0なら制限しない）
+        引数6 interpolate：ティックの間の弾の位置を補間して描くかどうか
+        引数7 stats：起動時間の計測先
+        引数8 record_to：入力を記録するファイルのパス（Noneなら記録しない．stateのシードは整数であること）
+        引数9 adaptive：フレーム時間が予算（1ティック分）に迫ったら演出の品質を下げるかどうか
+            記録中は再生がずれないよう，見た目だけを変える段階までしか下げない
+        引数10 telemetry_to：ティックごとのスプライト数や処理時間を記録するファイルのパス（Noneなら記録しない）
+        """
+        self.stats = stats
+        self.record_to = record_to
+        self.log = InputLog(state.seed, list(Bird.delta), FPS, state.waves is CLASSIC_WAVES,
+                            table_hash(state.waves), state.precise) if record_to else None
+        self.view = view
+        self.state = state
+        self.title = title
+        self.dirty = dirty
+        self.fps = max_fps
+        self.interpolate = interpolate
+        self.stepper = FixedTimestep(FPS)
+        self.pressed = []  # まだティックに渡していない押下キー
+        self.governor = None
+        if adaptive:
+            levels = QUALITY_LEVELS if record_to is None else QUALITY_LEVELS[:COSMETIC_LEVELS]
+            self.governor = Governor(levels, 1000 / FPS, log=partial(print, file=sys.stderr))
+        self.frame_start = time.perf_counter()  # このフレームの処理を始めた時刻
+        self.telemetry_to = telemetry_to
+        self.telemetry: Telemetry | None = None
+        self.samples: list[tuple[int, ...]] = []  # このフレームで進めたティックの記録（フレーム時間はdrawで加える）
+
+    def enter(self):
+        self.renderer = Renderer(self.view, self.state, ASSETS.load("fig/haikei.png"), self.dirty)
+        self.stepper.reset()
+        if self.telemetry_to:
+            self.telemetry = Telemetry(self.telemetry_to, TELEMETRY_COLUMNS)
+        PROFILER.start_frame()
+
+    def exit(self):
+        if self.state.over is None:  # 途中で閉じられたとき
+            self.state.close()
+        if self.log is not None:
+            self.log.save(self.record_to)
+        if self.telemetry is not None:
+            self.flush_samples((time.perf_counter() - self.frame_start) * 1000)  # 最後のフレームのティック
+            self.telemetry.close()
+
+    def step_state(self, inputs: Inputs):
+        """
+        ゲームを1ティック進める（ティックごとの記録中なら，進めた後の状態を控えておく）
+        """
+        state = self.state
+        tick = state.tmr
+        state.step(inputs)
+        if self.telemetry is not None:
+            self.samples.append((tick, *state.counts(), state.score.value, state.timer.time_left, state.skill.value))
+
+    def flush_samples(self, frame_ms: float):
+        """
+        このフレームで進めたティックの記録に，フレームの処理時間と演出の品質の段階を加えて書き出す
+        """
+        level = self.governor.level if self.governor is not None else 0
+        for sample in self.samples:
+            self.telemetry.record(*sample, frame_ms, level)
+        self.samples.clear()
+
+    def handle(self, event: pg.event.Event):
+        if event.type == pg.KEYDOWN:
+            if event.key == pg.K_F3:  # 計測結果の表示を切り替える（ゲームの入力には渡さない）
+                PROFILER.toggle_overlay()
+            else:
+                self.pressed.append(event.key)
+
+    def update(self) -> Scene:
+        state = self.state
+        self.frame_start = time.perf_counter()
+        PROFILER.mark("events")  # 前のフレームの終わりからのイベント処理と待ち時間
+        for _ in range(self.stepper.advance()):  # たまった時間の分だけティックを進める
+            self.step_state(self.next_inputs())
+            if state.over is not None:
+                return GameOver(self.renderer, state, self.title)
+        return self
+
+    def next_inputs(self) -> Inputs:
+        """
+        次のティックの入力を作る（記録中なら記録もする）
+        """
+        inputs = Inputs(pg.key.get_pressed(), tuple(self.pressed))
+        self.pressed = []  # 押下キーは最初のティックにだけ渡す
+        if self.log is not None:
+            self.log.record(inputs.keys, inputs.pressed)
+        return inputs
+
+    def draw(self):
+        self.renderer.draw(self.stepper.alpha if self.interpolate else 1.0)
+        if PROFILER.enabled:
+            PROFILER.end_frame(self.state.counts())
+        if self.stats is not None:
+            self.stats.game_shown()
+        frame_ms = (time.perf_counter() - self.frame_start) * 1000
+        if self.telemetry is not None:
+            self.flush_samples(frame_ms)
+        if self.governor is not None and self.governor.observe(frame_ms):
+            self.state.quality = self.governor.current
+
+
+class GameOver(Scene):
+    """
+    終了画面の場面
+    爆弾に当たったときはめじろう悲しみエフェクトを1秒見せてから，
+    最終スコアを5秒表示してタイトルに戻る（待つ間もイベントは処理する）
+    """
+    def __init__(self, renderer: Renderer, state: GameState, title: Scene):
+        """
+        引数1 renderer：ゲーム画面の描画に使っていたRenderer
+        引数2 state：終了したゲームの状態
+        引数3 title：戻るタイトルの場面
+        """
+        self.renderer = renderer
+        self.state = state
+        self.title = title
+
+    def enter(self):
+        self.renderer.draw()  # 最後のティックの画面
+        now = pg.time.get_ticks()
+        self.result_at = now + (1000 if self.state.over == "hit" else 0)  # スコアを表示する時刻
+        self.end_at = self.result_at + 5000  # タイトルに戻る時刻
+        self.shown = False
+
+    def exit(self):
+        self.state.close()
+
+    def wait_ms(self) -> int:
+        return (self.end_at if self.shown else self.result_at) - pg.time.get_ticks()
+
+    def update(self) -> Scene:
+        now = pg.time.get_ticks()
+        if not self.shown and now >= self.result_at:
+            # 終了スコア表示
+            self.renderer.draw_result()
+            self.shown = True
+        if now >= self.end_at:
+            return self.title
+        return self
+
 
-        tmr += 1
-        clock.tick(50)
+class Replaying(Playing):
+    """
+    記録した入力でゲームを再生する場面
+    uncapped=Trueなら待たずに1フレーム1ティックで可能な限り速く進め，性能の比較に使う
+    記録が尽きるかゲームが終わると，フレーム時間を集計してループを終える
+    """
+    def __init__(self, view: Viewport, log: InputLog, dirty: bool = True, uncapped: bool = False,
+                 precise: bool = False, waves: list[Wave] | None = None, telemetry_to: str | None = None):
+        """
+        引数1 view：描画先
+        引数2 log：再生する入力の記録
+        引数3 dirty：Trueなら差分描画，Falseなら毎フレーム全画面を描き直す
+        引数4 uncapped：Trueなら実時間に合わせず可能な限り速く再生する
+        引数5 precise：画素単位の当たり判定を使うかどうか（記録したときと同じにすること）
+        引数6 waves：ウェーブ表（記録したときと同じにすること）
+        引数7 telemetry_to：ティックごとのスプライト数や処理時間を記録するファイルのパス（Noneなら記録しない）
+        """
+        super().__init__(view, GameState(log.seed, precise=precise, waves=waves), None, dirty,
+                         interpolate=not uncapped, adaptive=False, telemetry_to=telemetry_to)
+        self.replay_log = log
+        self.uncapped = uncapped
+        if uncapped:
+            self.fps = 0  # 描画も待たずに進める
+        self.tick = 0  # 次に再生するティック
+        self.frame_times: list[float] = []  # フレームごとの時間（秒）
+        self.elapsed = 0.0  # 再生にかかった時間（秒）
+
+    def enter(self):
+        super().enter()
+        self.t0 = self.last = time.perf_counter()
+
+    def handle(self, event: pg.event.Event):
+        if event.type == pg.KEYDOWN and event.key == pg.K_F3:  # キー入力は記録から再生する
+            PROFILER.toggle_overlay()
+
+    def update(self) -> Scene | None:
+        state = self.state
+        self.frame_start = time.perf_counter()
+        PROFILER.mark("events")
+        for _ in range(1 if self.uncapped else self.stepper.advance()):
+            if self.tick >= len(self.replay_log) or state.over is not None:
+                self.elapsed = time.perf_counter() - self.t0
+                return None
+            self.step_state(self.next_inputs())
+        return self
+
+    def next_inputs(self) -> Inputs:
+        log, i = self.replay_log, self.tick
+        self.tick += 1
+        return Inputs.make(log.held(i), log.pressed(i))
+
+    def draw(self):
+        super().draw()
+        now = time.perf_counter()
+        self.frame_times.append(now - self.last)
+        self.last = now
+
+    def report(self) -> dict[str, float]:
+        """
+        再生の結果を集計する
+        戻り値：ティック数・フレーム数・時間・フレーム時間の統計（ミリ秒）・スコアの辞書
+        """
+        ms = np.array(self.frame_times) * 1000 if self.frame_times else np.zeros(1)
+        p50, p95, p99 = np.percentile(ms, (50, 95, 99)).tolist()
+        return {"ticks": self.tick, "frames": len(self.frame_times), "seconds": self.elapsed,
+                "frame_mean_ms": float(ms.mean()), "frame_p50_ms": p50, "frame_p95_ms": p95,
+                "frame_p99_ms": p99, "frame_max_ms": float(ms.max()), "score": self.state.score.value}
+
+
+def preload_jobs(render_scale: float = 1.0) -> list[Callable[[], object]]:
+    """
+    ゲームで使う画像の読み込みと変形の仕事のリストを返す
+    乱数で選ばれる敵機・爆弾の倍率もすべて変形しておき，プレイ中に変形しないようにする
+    引数 render_scale：描画の内部解像度の倍率（1でなければ，最後に全画像をこの倍率に縮小しておく）
+    戻り値：Preloaderに渡す仕事のリスト
+    """
+    paths = ["fig/haikei.png", "fig/mejirou.png", "fig/mejirou2.png", "fig/mejirou3.png",
+             "fig/beam.png", "fig/explosion.gif"] + Enemy.imgs
+    jobs = [partial(ASSETS.load, path) for path in paths]
+    jobs.append(Bird.load_imgs)
+    jobs += [partial(ASSETS.get, f"fig/mejirou{kind}.png", 0, 0.05) for kind in (2, 3)]
+    jobs += [partial(ASSETS.get, "fig/explosion.gif", flip=flip) for flip in ((False, False), (True, True))]
+    jobs += [partial(ASSETS.get, path, 0, 0.9, (True, False)) for path in Bomb.imgs]
+    scales = sorted(set(scale_steps(*Enemy.scales)) | set(scale_steps(*Bomb.scales)))
+    jobs += [partial(ASSETS.get, path, 0, scale) for path in Enemy.imgs for scale in scales]
+    jobs.append(partial(Beam.build_table, BEAM_HEADINGS))
+    # 画素単位の当たり判定用のマスク（矩形が画像と同じ大きさのもの）
+    jobs += [lambda path=path, scale=scale: ASSETS.mask_of(ASSETS.get(path, 0, scale))
+             for path in Enemy.imgs for scale in scale_steps(*Enemy.scales)]
+    jobs += [lambda kind=kind: ASSETS.mask_of(ASSETS.get(f"fig/mejirou{kind}.png", 0, 0.05)) for kind in (2, 3)]
+    jobs.append(lambda: [ASSETS.mask_of(img) for img in Beam.table.imgs])
+    if render_scale != 1:
+        jobs.append(lambda: ASSETS.prescale(render_scale, Beam.table.imgs))
+    return jobs
+
+
+def print_pool_stats():
+    """
+    ビーム・爆弾・爆発のプールの利用状況を表示する（プールの大きさを決める目安）
+    """
+    for pool in (BEAM_POOL, BOMB_POOL, EXPLOSION_POOL):
+        st = pool.stats()
+        print(f"{st['name']:>10}: capacity={st['capacity']} high_water={st['high_water']} "
+              f"hits={st['hits']} misses={st['misses']} discarded={st['discarded']}")
+
+
+def open_view(render_scale: float = 1.0, smooth: bool = False, fullscreen: bool = False) -> Viewport:
+    """
+    ウィンドウを開き，描画先を作る
+    引数1 render_scale：描画の内部解像度の論理解像度（WIDTH×HEIGHT）に対する倍率
+    引数2 smooth：ウィンドウへの転送にsmoothscaleを使うかどうか
+    引数3 fullscreen：画面全体に表示するかどうか（縦横比は保ち，余りは黒い帯にする）
+    戻り値：描画先
+    """
+    if fullscreen:
+        window = pg.display.set_mode((0, 0), pg.FULLSCREEN)
+    else:
+        window = pg.display.set_mode((WIDTH, HEIGHT))
+    return Viewport(window, (WIDTH, HEIGHT), render_scale, smooth, ASSETS)
+
+
+def replay(path: str, dirty: bool = True, uncapped: bool = False, precise: bool = False,
+           waves: list[Wave] | None = None, render_scale: float = 1.0, smooth: bool = False,
+           fullscreen: bool = False, telemetry_to: str | None = None) -> dict[str, float]:
+    """
+    記録した入力でゲームを再生し，かかった時間とフレーム時間の統計を返す
+    画像の準備は再生の前に済ませるので，再生の時間には含まれない
+    引数1 path：入力の記録ファイルのパス
+    引数2 dirty：Trueなら差分描画，Falseなら毎フレーム全画面を描き直す
+    引数3 uncapped：Trueなら実時間に合わせず可能な限り速く再生する
+    引数4 precise：画素単位の当たり判定を使うかどうか（記録したときと異なればValueError）
+    引数5 waves：ウェーブ表（記録したときと異なればValueError）
+    引数6 render_scale：描画の内部解像度の倍率
+    引数7 smooth：ウィンドウへの転送にsmoothscaleを使うかどうか
+    引数8 fullscreen：画面全体に表示するかどうか
+    引数9 telemetry_to：ティックごとのスプライト数や処理時間を記録するファイルのパス
+    戻り値：Replaying.report()の辞書
+    """
+    log = InputLog.load(path)
+    if log.tick_rate != FPS:
+        raise ValueError(f"{path} was recorded at {log.tick_rate} ticks/s, but the game runs at {FPS}")
+    if log.classic != (waves is None) or log.waves_hash != table_hash(waves or CLASSIC_WAVES):
+        recorded = "--classic" if log.classic else f"a wave table with hash {log.waves_hash:08x}"
+        given = "--classic" if waves is None else f"a wave table with hash {table_hash(waves):08x}"
+        raise ValueError(f"{path} was recorded with {recorded}, but the replay uses {given}")
+    if log.precise != precise:
+        raise ValueError(f"{path} was recorded {'with' if log.precise else 'without'} --precise-hits")
+    pg.display.set_caption("詰む積む（再生）")
+    view = open_view(render_scale, smooth, fullscreen)
+    for job in preload_jobs(render_scale):
+        job()
+    scene = Replaying(view, log, dirty, uncapped, precise, waves, telemetry_to)
+    SceneManager(scene).run()
+    return scene.report()
+
+
+def main(dirty: bool = True, seed: int | None = None, max_fps: int = MAX_FPS, interpolate: bool = True,
+         stats: StartupStats | None = None, record_to: str | None = None, precise: bool = False,
+         waves: list[Wave] | None = None, render_scale: float = 1.0, smooth: bool = False,
+         fullscreen: bool = False, adaptive: bool = True, telemetry_to: str | None = None):
+    """
+    ゲームを実行する（タイトル → プレイ中 → 終了画面 → タイトル…をウィンドウが閉じられるまで繰り返す）
+    引数1 dirty：Trueなら変化した領域だけを描き直す差分描画，Falseなら毎フレーム全画面を描き直す
+    引数2 seed：乱数のシード（Noneなら毎回異なる）
+    引数3 max_fps：プレイ中の描画の最大フレームレート（0なら制限しない）
+    引数4 interpolate：ティックの間の弾の位置を補間して描くかどうか
+    引数5 stats：起動時間の計測先（Noneなら計らない）
+    引数6 record_to：入力を記録するファイルのパス（ゲームごとに上書きする．Noneなら記録しない）
+    引数7 precise：画素単位の当たり判定を使うかどうか
+    引数8 waves：ウェーブ表（Noneなら最後まで同じ出方をするCLASSIC_WAVES）
+    引数9 render_scale：描画の内部解像度の論理解像度に対する倍率（0.5なら縦横半分で描いて拡大する）
+    引数10 smooth：ウィンドウへの転送にsmoothscaleを使うかどうか
+    引数11 fullscreen：画面全体に表示するかどうか
+    引数12 adaptive：処理が重いときに演出の品質を自動で下げるかどうか
+    引数13 telemetry_to：ティックごとのスプライト数や処理時間を記録するファイルのパス（ゲームごとに上書きする）
+    """
+    pg.display.set_caption("詰む積む")
+    view = open_view(render_scale, smooth, fullscreen)
+
+    def new_game() -> Scene:
+        game_seed = seed
+        if game_seed is None and record_to is not None:  # 再生できるようにシードを決めておく
+            game_seed = random.randrange(2**31)
+        state = GameState(game_seed, precise=precise, waves=waves)
+        return Playing(view, state, start, dirty, max_fps, interpolate, stats, record_to, adaptive, telemetry_to)
+
+    # スタート画面を出している間に，画像の読み込み・変換（内部解像度への縮小を含む）を裏で進める
+    start = Start(view, new_game, stats)
+    start.preload(preload_jobs(render_scale))
+    return SceneManager(start).run()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="詰む積む")
+    parser.add_argument("--full-redraw", action="store_true",
+                        help="差分描画を使わず毎フレーム全画面を描き直す")
+    parser.add_argument("--seed", type=int, default=None, help="乱数のシード")
+    parser.add_argument("--pool-stats", action="store_true",
+                        help="終了時にビーム・爆弾・爆発のプールの利用状況を表示する")
+    parser.add_argument("--max-fps", type=int, default=MAX_FPS,
+                        help=f"描画の最大フレームレート（既定は{MAX_FPS}．0なら制限しない．シミュレーションは常に50ティック/秒）")
+    parser.add_argument("--no-interpolate", action="store_true",
+                        help="ティックの間の弾の位置を補間しない")
+    parser.add_argument("--profile-csv", metavar="PATH", default=None,
+                        help="プレイ中のフレームごとの処理時間（フェーズ別）とスプライト数をCSVファイルに書き出す")
+    parser.add_argument("--precise-hits", action="store_true",
+                        help="矩形が重なったものだけを画素単位で調べ直し，透明な部分では当たらないようにする")
+    parser.add_argument("--waves", metavar="PATH", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "waves.json"),
+                        help="ウェーブ表（時間とともに敵機や爆弾を増やす設定）のJSONファイル（既定はwaves.json）")
+    parser.add_argument("--classic", action="store_true",
+                        help="ウェーブ表を使わず，最後まで同じ出方をする元のゲームにする")
+    parser.add_argument("--record", metavar="PATH", default=None,
+                        help="プレイの入力（シードとティックごとのキー）をファイルに記録する")
+    parser.add_argument("--replay", metavar="PATH", default=None,
+                        help="記録した入力でゲームを再生し，かかった時間とフレーム時間の統計を表示する")
+    parser.add_argument("--uncapped", action="store_true",
+                        help="--replayで実時間に合わせず可能な限り速く再生する")
+    parser.add_argument("--render-scale", type=float, default=1.0,
+                        help="描画の内部解像度の倍率（0.5なら縦横半分の解像度で描き，1回の拡大でウィンドウに表示する）")
+    parser.add_argument("--smooth", action="store_true",
+                        help="内部解像度からウィンドウへの拡大縮小にsmoothscaleを使う（きれいだが遅い）")
+    parser.add_argument("--fullscreen", action="store_true",
+                        help="画面全体に表示する（ゲームの座標は変えずに描いた画面を拡大する）")
+    parser.add_argument("--no-governor", action="store_true",
+                        help="処理が重いときに演出（爆発の数・長さ・アニメーション，拡散ビームの本数）を自動で減らさない")
+    parser.add_argument("--telemetry", metavar="PATH", default=None,
+                        help="ティックごとのスプライト数・点数・残り時間・スキル・フレーム時間を列ごとのバイナリファイルに記録する")
+    parser.add_argument("--startup-stats", action="store_true",
+                        help="終了時に最初の画面が出るまでの時間とEnterキーからゲーム開始までの時間を表示する")
+    args = parser.parse_args()
+    stats = StartupStats() if args.startup_stats else None
+    if args.profile_csv:
+        PROFILER.open_csv(args.profile_csv)
+    waves = None if args.classic else load_waves(args.waves, FPS)
     pg.init()
-    main()
+    if args.replay:
+        result = replay(args.replay, dirty=not args.full_redraw, uncapped=args.uncapped,
+                        precise=args.precise_hits, waves=waves, render_scale=args.render_scale,
+                        smooth=args.smooth, fullscreen=args.fullscreen, telemetry_to=args.telemetry)
+        print(" ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()))
+    else:
+        main(dirty=not args.full_redraw, seed=args.seed, max_fps=args.max_fps,
+             interpolate=not args.no_interpolate, stats=stats, record_to=args.record,
+             precise=args.precise_hits, waves=waves, render_scale=args.render_scale,
+             smooth=args.smooth, fullscreen=args.fullscreen, adaptive=not args.no_governor,
+             telemetry_to=args.telemetry)
+    PROFILER.close()
+    if args.pool_stats:
+        print_pool_stats()
+    if stats is not None:
+        stats.report()
     pg.quit()
     sys.exit()
-
-
@@ -0,0 +1,80 @@
+from typing import Callable, Generic, TypeVar
+
+
+T = TypeVar("T")
+
+
+class Pool(Generic[T]):
+    """
+    使い終わったオブジェクトを捨てずに取っておき，reset(...)で初期化し直して再利用するプール
+    プールに取っておく数はcapacityまでで，それを超えた分は普通に捨てる
+    オブジェクトはreset(*args, **kwargs)メソッドとpool属性を持つこと
+    """
+    def __init__(self, factory: Callable[..., T], capacity: int, name: str = ""):
+        """
+        引数1 factory：プールが空のときに新しいオブジェクトを作る関数（クラスなど）
+        引数2 capacity：取っておくオブジェクトの最大数
+        引数3 name：統計表示用の名前
+        """
+        self.factory = factory
+        self.capacity = capacity
+        self.name = name or getattr(factory, "__name__", "")
+        self.free: list[T] = []
+        self.hits = 0  # 再利用できた回数
+        self.misses = 0  # 新しく作った回数
+        self.discarded = 0  # 満杯で捨てた回数
+        self.in_use = 0  # 貸し出し中の数
+        self.high_water = 0  # 貸し出し中の数の最大値
+
+    def acquire(self, *args, **kwargs) -> T:
+        """
+        オブジェクトを1つ借りる（空いていれば再利用し，無ければ作る）
+        引数：resetまたはfactoryに渡す引数
+        戻り値：初期化済みのオブジェクト
+        """
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+            self.hits += 1
+        else:
+            obj = self.factory(*args, **kwargs)
+            self.misses += 1
+        obj.pool = self
+        self.in_use += 1
+        if self.in_use > self.high_water:
+            self.high_water = self.in_use
+        return obj
+
+    def release(self, obj: T):
+        """
+        借りたオブジェクトを返す
+        引数 obj：返すオブジェクト
+        """
+        obj.pool = None
+        self.in_use -= 1
+        if len(self.free) < self.capacity:
+            self.free.append(obj)
+        else:
+            self.discarded += 1
+
+    def stats(self) -> dict[str, int | str]:
+        """
+        プールの利用状況を返す
+        戻り値：名前・容量・再利用回数・生成回数・破棄回数・貸し出し中の数・その最大値の辞書
+        """
+        return {"name": self.name, "capacity": self.capacity, "hits": self.hits, "misses": self.misses,
+                "discarded": self.discarded, "in_use": self.in_use, "high_water": self.high_water}
+
+
+class PooledSprite:
+    """
+    Poolから借りるスプライト用の混ぜ込みクラス
+    kill()されたときに借りたプールへ自動で返す（pg.sprite.Spriteより前に継承すること）
+    """
+    __slots__ = ()
+
+    def kill(self):
+        super().kill()
+        pool = self.pool
+        if pool is not None:
+            pool.release(self)
@@ -0,0 +1,178 @@
+import csv
+import time
+
+import numpy as np
+import pygame as pg
+
+
+class Profiler:
+    """
+    フレームを処理の段階（フェーズ）ごとに区切り，かかった時間をperf_counter_nsで計るクラス
+    直近sizeフレーム分の時間と個数をリングバッファに保持し，パーセンタイルを求められる
+    無効なときはmark()がすぐに戻るだけなので，常に組み込んだままでよい
+    """
+    def __init__(self, phases: list[str], counters: list[str], size: int = 600):
+        """
+        引数1 phases：フェーズの名前のリスト
+        引数2 counters：フレームごとに記録する個数（スプライトの数など）の名前のリスト
+        引数3 size：保持するフレーム数
+        """
+        self.phases = list(phases)
+        self.counters = list(counters)
+        self.index = {name: i for i, name in enumerate(self.phases)}
+        self.size = size
+        self.times = np.zeros((size, len(self.phases) + 1), dtype=np.int64)  # 各フレームのフェーズごとの時間と合計（ns）
+        self.counts = np.zeros((size, len(self.counters)), dtype=np.int64)  # 各フレームの個数
+        self.frames = 0  # 記録したフレーム数
+        self.enabled = False
+        self.show_overlay = False  # 画面に統計を表示するかどうか
+        self._cur = [0] * len(self.phases)  # 計測中のフレームのフェーズごとの時間
+        self._start = self._last = 0  # 計測中のフレームの開始時刻と，最後にmark()した時刻
+        self._csv_file = None
+        self._csv = None
+
+    def _update_enabled(self):
+        enabled = self.show_overlay or self._csv is not None
+        if enabled and not self.enabled:  # 無効だった間の時間を数えない
+            self.start_frame()
+        self.enabled = enabled
+
+    def start_frame(self):
+        """
+        計測中のフレームを捨てて今から計り直す（画面切り替えの直後などに呼ぶ）
+        """
+        self._cur = [0] * len(self.phases)
+        self._start = self._last = time.perf_counter_ns()
+
+    def toggle_overlay(self):
+        """
+        画面への統計の表示を切り替える（表示中またはCSV出力中だけ計測する）
+        """
+        self.show_overlay = not self.show_overlay
+        self._update_enabled()
+
+    def open_csv(self, path: str):
+        """
+        フレームごとの時間と個数をCSVファイルに書き出し始める
+        引数 path：CSVファイルのパス
+        """
+        self._csv_file = open(path, "w", newline="")
+        self._csv = csv.writer(self._csv_file)
+        self._csv.writerow(["frame", "total_ns"] + [f"{p}_ns" for p in self.phases] + self.counters)
+        self._update_enabled()
+
+    def close(self):
+        """
+        CSVファイルを閉じる
+        """
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = self._csv = None
+            self._update_enabled()
+
+    def mark(self, phase: str):
+        """
+        前回のmark()からの時間をフェーズphaseの時間として加える
+        引数 phase：今終わったフェーズの名前
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        self._cur[self.index[phase]] += now - self._last
+        self._last = now
+
+    def end_frame(self, counts: tuple[int, ...] = ()):
+        """
+        1フレームの計測を終えてリングバッファ（とCSV）に記録し，次のフレームの計測を始める
+        引数 counts：このフレームの個数（countersと同じ順）
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        total = now - self._start
+        row = self.frames % self.size
+        self.times[row, :-1] = self._cur
+        self.times[row, -1] = total
+        if counts:
+            self.counts[row] = counts
+        if self._csv is not None:
+            self._csv.writerow([self.frames, total] + self._cur + list(counts))
+        self.frames += 1
+        self._cur = [0] * len(self.phases)
+        self._start = self._last = now
+
+    def percentiles(self, qs: tuple[float, ...] = (50, 95, 99)) -> dict[str, list[float]]:
+        """
+        保持しているフレームについて，合計と各フェーズの時間のパーセンタイルを求める
+        引数 qs：求めるパーセンタイル
+        戻り値：フェーズ名（合計は"frame"）をキー，ミリ秒単位のパーセンタイルのリストを値とする辞書
+        """
+        n = min(self.frames, self.size)
+        if n == 0:
+            return {}
+        ms = np.percentile(self.times[:n], qs, axis=0) / 1e6
+        return {name: ms[:, i].tolist() for i, name in enumerate(self.phases + ["frame"])}
+
+    def latest_counts(self) -> dict[str, int]:
+        """
+        最後に記録したフレームの個数を返す
+        """
+        if self.frames == 0:
+            return {}
+        row = (self.frames - 1) % self.size
+        return dict(zip(self.counters, self.counts[row].tolist()))
+
+
+class ProfilerOverlay(pg.sprite.DirtySprite):
+    """
+    Profilerの統計（フレーム時間のp50/p95/p99，フェーズごとの時間，個数）を画面の隅に表示するスプライト
+    文字の描き直しはinterval回に1回だけ行う
+    """
+    _layer = 7
+
+    def __init__(self, profiler: Profiler, interval: int = 30):
+        """
+        引数1 profiler：表示するProfiler
+        引数2 interval：表示を更新するフレーム間隔
+        """
+        super().__init__()
+        self.profiler = profiler
+        self.interval = interval
+        self.font = pg.font.Font(None, 22)
+        self.image = pg.Surface((1, 1))
+        self.rect = self.image.get_rect(topleft=(10, 100))
+        self.visible = 0
+        self.shown_at = -1  # 最後に表示を更新したときのフレーム数
+
+    def refresh(self):
+        """
+        表示の有無を反映し，必要なら統計を描き直す
+        """
+        prof = self.profiler
+        visible = int(prof.show_overlay)
+        if visible != self.visible:
+            self.visible = visible
+            self.dirty = 1
+        if not visible or prof.frames - self.shown_at < self.interval:
+            return
+        self.shown_at = prof.frames
+        stats = prof.percentiles()
+        lines = []
+        for name in ["frame"] + prof.phases:
+            if name in stats:
+                p50, p95, p99 = stats[name]
+                lines.append(f"{name:>8} {p50:6.2f} {p95:6.2f} {p99:6.2f}")
+        counts = prof.latest_counts()
+        lines.append(" ".join(f"{k}:{v}" for k, v in counts.items()))
+        imgs = [self.font.render("   [ms]    p50    p95    p99", True, (255, 255, 0))]
+        imgs += [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(img.get_width() for img in imgs) + 8
+        height = sum(img.get_height() for img in imgs) + 8
+        self.image = pg.Surface((width, height), pg.SRCALPHA)
+        self.image.fill((0, 0, 0, 180))  # 半透明の黒い下地
+        y = 4
+        for img in imgs:
+            self.image.blit(img, (4, y))
+            y += img.get_height()
+        self.rect = self.image.get_rect(topleft=self.rect.topleft)
+        self.dirty = 1
@@ -0,0 +1,121 @@
+import numpy as np
+import pygame as pg
+
+
+class ProjectileEngine:
+    """
+    ビームや爆弾などの弾の位置・速度・大きさ・生存フラグをNumPy配列でまとめて持ち，
+    全弾を1回の配列演算で動かすクラス
+    位置は小数のまま保持し，描画用のスプライトにはsync()でまとめて反映する
+    """
+    def __init__(self, bounds: tuple[int, int], capacity: int = 64):
+        """
+        引数1 bounds：画面の幅と高さ（はみ出した弾は消える）
+        引数2 capacity：最初に確保する弾の数（足りなくなれば倍に増やす）
+        """
+        self.width, self.height = bounds
+        self.x = np.zeros(capacity)  # 中心のx座標
+        self.y = np.zeros(capacity)  # 中心のy座標
+        self.vx = np.zeros(capacity)  # 1ティックあたりのx方向移動量
+        self.vy = np.zeros(capacity)  # 1ティックあたりのy方向移動量
+        self.w = np.zeros(capacity)  # 当たり判定の幅
+        self.h = np.zeros(capacity)  # 当たり判定の高さ
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.sprites: list[pg.sprite.Sprite | None] = [None] * capacity  # 描画用のスプライト
+        self.free: list[int] = []  # 空いているスロット番号
+        self.used = 0  # 一度でも使ったスロットの数（これより後ろは常に空き）
+
+    def __len__(self) -> int:
+        return self.used - len(self.free)
+
+    def _grow(self):
+        """
+        配列の大きさを倍にする
+        """
+        n = len(self.alive)
+        for name in ("x", "y", "vx", "vy", "w", "h", "alive"):
+            arr = getattr(self, name)
+            setattr(self, name, np.concatenate([arr, np.zeros(n, dtype=arr.dtype)]))
+        self.sprites.extend([None] * n)
+
+    def add(self, sprite: pg.sprite.Sprite, vx: float, vy: float) -> int:
+        """
+        スプライトの矩形の中心と大きさを初期値として弾を追加する
+        引数1 sprite：描画用のスプライト（弾が消えるとkill()される）
+        引数2 vx：1ティックあたりのx方向移動量
+        引数3 vy：1ティックあたりのy方向移動量
+        戻り値：弾のスロット番号（sprite.slotにも入る）
+        """
+        if self.free:
+            i = self.free.pop()
+        else:
+            if self.used == len(self.alive):
+                self._grow()
+            i = self.used
+            self.used += 1
+        rect = sprite.rect
+        self.x[i], self.y[i] = rect.centerx, rect.centery
+        self.vx[i], self.vy[i] = vx, vy
+        self.w[i], self.h[i] = rect.width, rect.height
+        self.alive[i] = True
+        self.sprites[i] = sprite
+        sprite.slot = i
+        return i
+
+    def remove(self, i: int):
+        """
+        スロットiの弾を消し，描画用のスプライトもkill()する
+        """
+        if not self.alive[i]:
+            return
+        self.alive[i] = False
+        self.sprites[i].kill()
+        self.sprites[i] = None
+        self.free.append(i)
+
+    def clear(self):
+        """
+        すべての弾を消す
+        """
+        for i in np.flatnonzero(self.alive[:self.used]):
+            self.remove(int(i))
+
+    def step(self):
+        """
+        全弾を速度に従って動かし，画面からはみ出した弾を消す
+        """
+        n = self.used
+        if n == len(self.free):  # 弾が1つも無い
+            return
+        alive = self.alive[:n]
+        x, y = self.x[:n], self.y[:n]
+        x += self.vx[:n]
+        y += self.vy[:n]
+        hw, hh = self.w[:n] / 2, self.h[:n] / 2
+        out = alive & ((x - hw < 0) | (x + hw > self.width) | (y - hh < 0) | (y + hh > self.height))
+        for i in np.flatnonzero(out):
+            self.remove(int(i))
+
+    def live(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        生きている弾のスロット番号と当たり判定の箱を返す
+        戻り値：スロット番号の配列と，各行が(左, 上, 右, 下)の (n, 4) 配列
+        """
+        slots = np.flatnonzero(self.alive[:self.used])
+        x, y = self.x[slots], self.y[slots]
+        hw, hh = self.w[slots] / 2, self.h[slots] / 2
+        return slots, np.stack([x - hw, y - hh, x + hw, y + hh], axis=1)
+
+    def sync(self, slots: np.ndarray | None = None, alpha: float = 1.0):
+        """
+        弾の位置を描画用スプライトの矩形に反映する
+        引数1 slots：反映するスロット番号（Noneなら生きている全弾）
+        引数2 alpha：1ティック前の位置から今の位置までのどこを反映するか（1なら今の位置）
+        """
+        if slots is None:
+            slots = np.flatnonzero(self.alive[:self.used])
+        back = 1.0 - alpha  # 等速で動くので，1ティック前の位置は速度を引けば分かる
+        xs = np.rint(self.x[slots] - back * self.vx[slots]).astype(int).tolist()
+        ys = np.rint(self.y[slots] - back * self.vy[slots]).astype(int).tolist()
+        for i, x, y in zip(slots.tolist(), xs, ys):
+            self.sprites[i].rect.center = (x, y)
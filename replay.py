@@ -0,0 +1,104 @@
+import struct
+from typing import Mapping, Sequence
+
+
+MAGIC = b"MJRP"  # 記録ファイルの先頭
+VERSION = 2
+# 先頭，版，乱数のシード，1秒あたりのティック数，押され続けを記録するキーの数，
+# 元のゲームの出方かどうか，ウェーブ表のハッシュ値，画素単位の当たり判定かどうか
+HEADER = struct.Struct("<4sBqHB?I?")
+KEY = struct.Struct("<I")  # キー番号
+TICK = struct.Struct("<BB")  # 押され続けているキーのビット列，このティックで押されたキーの数
+
+
+class InputLog:
+    """
+    1回のゲームの入力（乱数のシード・ゲームのモードと，ティックごとのキーの状態）の記録
+    押され続けているキーは決めたキーだけを1ティック1バイトのビット列で，
+    押されたキー（KEYDOWN）はその数とキー番号で持つので，60秒のゲームでも数KB程度になる
+    """
+    def __init__(self, seed: int, held_keys: Sequence[int], tick_rate: int,
+                 classic: bool = False, waves_hash: int = 0, precise: bool = False):
+        """
+        引数1 seed：ゲームの乱数のシード
+        引数2 held_keys：押され続けを記録するキー（8個まで）
+        引数3 tick_rate：1秒あたりのティック数
+        引数4 classic：ウェーブ表を使わない元のゲームの出方かどうか
+        引数5 waves_hash：使ったウェーブ表のハッシュ値（waves.table_hash()の値）
+        引数6 precise：画素単位の当たり判定を使ったかどうか
+        """
+        if len(held_keys) > 8:
+            raise ValueError("held_keys must have at most 8 keys")
+        self.seed = seed
+        self.held_keys = list(held_keys)
+        self.tick_rate = tick_rate
+        self.classic = classic
+        self.waves_hash = waves_hash
+        self.precise = precise
+        self.ticks: list[tuple[int, tuple[int, ...]]] = []  # ティックごとの(ビット列, 押されたキー)
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    def record(self, keys: "Sequence[bool] | Mapping[int, bool]", pressed: Sequence[int]):
+        """
+        1ティック分の入力を記録する
+        引数1 keys：押され続けているキー（pg.key.get_pressed()の結果など）
+        引数2 pressed：このティックで押されたキー
+        """
+        mask = 0
+        for bit, key in enumerate(self.held_keys):
+            if keys[key]:
+                mask |= 1 << bit
+        self.ticks.append((mask, tuple(pressed)))
+
+    def held(self, i: int) -> list[int]:
+        """
+        ティックiで押され続けていたキーを返す
+        """
+        mask = self.ticks[i][0]
+        return [key for bit, key in enumerate(self.held_keys) if mask >> bit & 1]
+
+    def pressed(self, i: int) -> tuple[int, ...]:
+        """
+        ティックiで押されたキーを返す
+        """
+        return self.ticks[i][1]
+
+    def save(self, path: str):
+        """
+        記録をファイルに書き出す
+        引数 path：ファイルのパス
+        """
+        out = [HEADER.pack(MAGIC, VERSION, self.seed, self.tick_rate, len(self.held_keys),
+                           self.classic, self.waves_hash, self.precise)]
+        out += [KEY.pack(key) for key in self.held_keys]
+        for mask, pressed in self.ticks:
+            out.append(TICK.pack(mask, len(pressed)))
+            out += [KEY.pack(key) for key in pressed]
+        with open(path, "wb") as f:
+            f.write(b"".join(out))
+
+    @classmethod
+    def load(cls, path: str) -> "InputLog":
+        """
+        ファイルから記録を読み込む
+        引数 path：ファイルのパス
+        戻り値：読み込んだ記録
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size or data[:4] != MAGIC or data[4] != VERSION:
+            raise ValueError(f"{path} is not an input log (version {VERSION})")
+        _, _, seed, tick_rate, n_held, classic, waves_hash, precise = HEADER.unpack_from(data)
+        pos = HEADER.size
+        held_keys = [KEY.unpack_from(data, pos + i * KEY.size)[0] for i in range(n_held)]
+        pos += n_held * KEY.size
+        log = cls(seed, held_keys, tick_rate, classic, waves_hash, precise)
+        while pos < len(data):
+            mask, n = TICK.unpack_from(data, pos)
+            pos += TICK.size
+            pressed = tuple(KEY.unpack_from(data, pos + i * KEY.size)[0] for i in range(n))
+            pos += n * KEY.size
+            log.ticks.append((mask, pressed))
+        return log
@@ -0,0 +1,87 @@
+import pygame as pg
+
+
+class Scene:
+    """
+    タイトル・プレイ中・終了画面などの場面の基底クラス
+    SceneManagerが毎フレーム handle → update → draw の順に呼ぶ
+    """
+    fps = 30  # この場面の最大フレームレート（0なら制限しない）
+
+    def enter(self):
+        """
+        この場面に切り替わったときに呼ばれる
+        """
+
+    def exit(self):
+        """
+        この場面から別の場面に切り替わるときに呼ばれる
+        """
+
+    def wait_ms(self) -> int | None:
+        """
+        入力を待つ最大時間を返す（Noneなら待たずに毎フレーム進める）
+        動きの無い場面では，ここで待つ間CPUを使わない
+        """
+        return None
+
+    def handle(self, event: pg.event.Event):
+        """
+        イベントを1つ処理する
+        """
+
+    def update(self) -> "Scene | None":
+        """
+        場面を1フレーム進める
+        戻り値：次の場面（切り替えないならself，終了するならNone）
+        """
+        return self
+
+    def draw(self):
+        """
+        場面を描画する
+        """
+
+
+class SceneManager:
+    """
+    場面を切り替えながらゲーム全体のループを回すクラス
+    どの場面でもイベントを処理し続けるので，待ち時間中もウィンドウが応答する
+    """
+    def __init__(self, scene: Scene):
+        """
+        引数 scene：最初の場面
+        """
+        self.scene = scene
+        self.clock = pg.time.Clock()
+
+    def run(self) -> int:
+        """
+        ウィンドウが閉じられるか場面がNoneになるまでループを回す
+        戻り値：終了コード
+        """
+        scene = self.scene
+        scene.enter()
+        while scene is not None:
+            timeout = scene.wait_ms()
+            if timeout is None:
+                events = pg.event.get()
+            else:
+                event = pg.event.wait(max(1, timeout))  # 入力が来るか時間切れまで眠る
+                events = ([] if event.type == pg.NOEVENT else [event]) + pg.event.get()
+            for event in events:
+                if event.type == pg.QUIT:
+                    scene.exit()
+                    return 0
+                scene.handle(event)
+            nxt = scene.update()
+            if nxt is not scene:
+                scene.exit()
+                scene = self.scene = nxt
+                if scene is not None:
+                    scene.enter()
+                continue
+            scene.draw()
+            if timeout is None:
+                self.clock.tick(scene.fps)
+        return 0
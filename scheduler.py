@@ -0,0 +1,48 @@
+import heapq
+import itertools
+from typing import Callable
+
+
+class Scheduler:
+    """
+    ティック時刻を決めた予定（関数呼び出し）をヒープに入れておき，時刻が来たものだけを実行するクラス
+    毎ティック全部を調べる代わりに，その時刻の予定の数だけの手間で済む
+    同じ時刻の予定は (phase, rank) の小さい順，それも同じなら登録順に実行する
+    """
+    def __init__(self):
+        self._heap: list[tuple[int, int, int, int, Callable, tuple]] = []
+        self._seq = itertools.count()  # 登録順
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def at(self, tick: int, func: Callable, *args, phase: int = 0, rank: int = 0):
+        """
+        ティックtickにfunc(*args)を実行する予定を入れる
+        引数1 tick：実行するティック（過ぎていれば次のrun()で実行する）
+        引数2 func：実行する関数
+        引数3 args：funcに渡す引数
+        引数4 phase：同じ時刻の予定の中での実行順（小さいほど先）
+        引数5 rank：同じphaseの中での実行順（小さいほど先）
+        """
+        heapq.heappush(self._heap, (tick, phase, rank, next(self._seq), func, args))
+
+    def run(self, tick: int) -> int:
+        """
+        ティックtickまでの予定を時刻順にすべて実行する（実行中に入れられた予定も時刻が来ていれば実行する）
+        引数 tick：今のティック
+        戻り値：実行した予定の数
+        """
+        heap = self._heap
+        n = 0
+        while heap and heap[0][0] <= tick:
+            _, _, _, _, func, args = heapq.heappop(heap)
+            func(*args)
+            n += 1
+        return n
+
+    def clear(self):
+        """
+        すべての予定を取り消す
+        """
+        self._heap.clear()
@@ -0,0 +1,277 @@
+"""
+難易度と得点の調整値の一括評価
+調整値（Tuning）の組み合わせ・乱数のシード・操作ボットの組ごとに画面無しでゲームを最後まで進め，
+得点・生存時間・スプライト数の分布を調整値とボットの組ごとにまとめて表にする
+ゲームはプロセスプールで全コアに分けて実行する
+
+実行例：
+    python sweep.py --set bomb_speed=4,6,8 --set skill_max=3,5 --seeds 200 --policy gunner dodger
+    python sweep.py --set enemy_scales=1.0:2.0,1.5:2.8 --seeds 1000 --csv runs.csv
+"""
+import argparse
+import csv
+import itertools
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, NamedTuple
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # 標準出力に結果を書けるよう，pygameの挨拶を出さない
+
+import numpy as np
+import pygame as pg
+
+import mejirou
+from mejirou import FPS, HEIGHT, WIDTH, GameState, Inputs, Tuning, preload_jobs, simulate
+from waves import Wave, load_waves
+
+
+FIRE_EVERY = 4  # ボットが通常ビームを撃つティック間隔
+DODGE_RANGE = 150  # dodgerが爆弾を避け始める距離
+
+
+def idle(state: GameState) -> Inputs:
+    """
+    何も操作しないボット
+    """
+    return Inputs.make()
+
+
+def heading(dx: float, dy: float) -> list[int]:
+    """
+    (dx, dy)の方向に動くために押すキーを返す（8方向）
+    """
+    keys = []
+    if abs(dx) > 5:
+        keys.append(pg.K_RIGHT if dx > 0 else pg.K_LEFT)
+    if abs(dy) > 5:
+        keys.append(pg.K_DOWN if dy > 0 else pg.K_UP)
+    return keys
+
+
+def attack(state: GameState, held: list[int]) -> Inputs:
+    """
+    heldのキーを押しながら，拡散ビームを撃てるなら撃ち，そうでなければFIRE_EVERYティックごとに通常ビームを撃つ
+    """
+    if state.skill.ready():
+        return Inputs.make(held, [pg.K_RETURN])
+    return Inputs.make(held, [pg.K_SPACE] if state.tmr % FIRE_EVERY == 0 else [])
+
+
+def gunner(state: GameState) -> Inputs:
+    """
+    最も近い敵機に向かって動きながら撃ち続けるボット（めじろうは動いた向きにビームを撃つ）
+    """
+    bird = state.bird.rect
+    emys = state.emys.sprites()
+    if not emys:
+        return attack(state, [])
+    target = min(emys, key=lambda emy: (emy.rect.centerx - bird.centerx) ** 2 + (emy.rect.centery - bird.centery) ** 2)
+    return attack(state, heading(target.rect.centerx - bird.centerx, target.rect.centery - bird.centery))
+
+
+def dodger(state: GameState) -> Inputs:
+    """
+    近くに爆弾があればそこから離れ，無ければgunnerと同じように動いて撃つボット
+    """
+    bird = state.bird.rect
+    _, boxes = state.bomb_engine.live()
+    if len(boxes):
+        dx = (boxes[:, 0] + boxes[:, 2]) / 2 - bird.centerx
+        dy = (boxes[:, 1] + boxes[:, 3]) / 2 - bird.centery
+        d2 = dx * dx + dy * dy
+        i = int(d2.argmin())
+        if d2[i] < DODGE_RANGE ** 2:
+            away_x, away_y = -dx[i], -dy[i]
+            # 画面の端で止まらないよう，端に近ければ中央へ向かう成分を足す
+            away_x += (WIDTH / 2 - bird.centerx) * 0.2
+            away_y += (HEIGHT / 2 - bird.centery) * 0.2
+            return attack(state, heading(away_x, away_y))
+    return gunner(state)
+
+
+POLICIES: dict[str, Callable[[GameState], Inputs]] = {"idle": idle, "gunner": gunner, "dodger": dodger}
+
+
+class Job(NamedTuple):
+    """
+    1回のゲームの条件
+    """
+    config: int  # 調整値の組み合わせの番号
+    tuning: Tuning
+    policy: str  # ボットの名前（POLICIESのキー）
+    seed: int
+    total_time: int  # 制限時間（秒）
+    waves: list[Wave] | None
+
+
+def parse_values(field: str, text: str) -> list:
+    """
+    --setの値（カンマ区切り．範囲は 最小:最大）をTuningの項目の型に直す
+    引数1 field：Tuningの項目名
+    引数2 text：値の文字列
+    戻り値：値のリスト
+    """
+    if field not in Tuning._fields:
+        raise ValueError(f"unknown tuning field {field!r} (choose from {', '.join(Tuning._fields)})")
+    default = Tuning._field_defaults[field]
+    values = []
+    for item in text.split(","):
+        if isinstance(default, tuple):
+            bounds = tuple(float(v) for v in item.split(":"))
+            if len(bounds) != 2 or bounds[0] > bounds[1]:
+                raise ValueError(f"{field}: expected MIN:MAX with MIN <= MAX, got {item!r}")
+            values.append(bounds)
+        else:
+            values.append(Tuning.__annotations__[field](item))
+    return values
+
+
+def configs(settings: list[str]) -> list[Tuning]:
+    """
+    --setの指定の全組み合わせの調整値を作る（指定の無い項目は既定値）
+    引数 settings："項目=値,値,..."の文字列のリスト
+    戻り値：調整値のリスト
+    """
+    fields, choices = [], []
+    for setting in settings:
+        field, _, text = setting.partition("=")
+        fields.append(field)
+        choices.append(parse_values(field, text))
+    return [Tuning()._replace(**dict(zip(fields, combo))) for combo in itertools.product(*choices)]
+
+
+def init_worker():
+    """
+    ワーカープロセスでpygameを初期化し，画像を準備しておく
+    """
+    pg.init()
+    pg.display.set_mode((WIDTH, HEIGHT))
+    for job in preload_jobs():
+        job()
+
+
+def play(job: Job) -> dict[str, float | int | str]:
+    """
+    1回のゲームを最後まで進めて結果を返す（ワーカープロセスで実行する）
+    引数 job：ゲームの条件
+    戻り値：得点・生存時間・終了理由と，スプライトの種類ごとの平均数と最大数の辞書
+    """
+    policy = POLICIES[job.policy]
+    counters = mejirou.PROFILER.counters
+    total = np.zeros(len(counters))
+    peak = np.zeros(len(counters), dtype=np.int64)
+
+    def observe(state: GameState) -> Inputs:
+        counts = state.counts()
+        total[:] += counts
+        np.maximum(peak, counts, out=peak)
+        return policy(state)
+
+    state = simulate(job.seed, policy=observe, waves=job.waves, total_time=job.total_time, tuning=job.tuning)
+    ticks = max(1, state.tmr)
+    result = {"config": job.config, "policy": job.policy, "seed": job.seed, "score": state.score.value,
+              "survived": state.tmr / FPS, "over": state.over}
+    for name, mean, top in zip(counters, (total / ticks).tolist(), peak.tolist()):
+        result[f"{name}_mean"] = mean
+        result[f"{name}_max"] = top
+    return result
+
+
+def summarize(runs: list[dict]) -> dict[str, float]:
+    """
+    同じ調整値とボットの結果をまとめる
+    戻り値：回数，得点と生存時間の平均・パーセンタイル，時間切れまで生き残った割合，スプライトの最大数の平均の辞書
+    """
+    scores = np.array([r["score"] for r in runs], dtype=float)
+    survived = np.array([r["survived"] for r in runs])
+    s10, s50, s90 = np.percentile(scores, (10, 50, 90)).tolist()
+    summary = {"runs": len(runs), "score_mean": float(scores.mean()), "score_p10": s10, "score_p50": s50,
+               "score_p90": s90, "survived_mean": float(survived.mean()),
+               "survived_p10": float(np.percentile(survived, 10)),
+               "cleared": sum(r["over"] == "time" for r in runs) / len(runs)}
+    for name in mejirou.PROFILER.counters:
+        summary[f"{name}_max"] = float(np.mean([r[f"{name}_max"] for r in runs]))
+    return summary
+
+
+def label(tuning: Tuning) -> str:
+    """
+    既定値と異なる調整値だけを並べた名前を返す
+    """
+    changed = [f"{k}={v}" for k, v in tuning._asdict().items() if v != Tuning._field_defaults[k]]
+    return " ".join(changed) or "default"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="難易度と得点の調整値の一括評価")
+    parser.add_argument("--set", action="append", default=[], metavar="FIELD=V1,V2,...",
+                        help=f"調べる調整値（範囲は 最小:最大．複数指定で全組み合わせ）．項目：{', '.join(Tuning._fields)}")
+    parser.add_argument("--seeds", type=int, default=20, help="組み合わせごとのゲーム数（シード0から順に使う）")
+    parser.add_argument("--policy", nargs="+", default=["dodger"], choices=sorted(POLICIES), help="操作するボット")
+    parser.add_argument("--total-time", type=int, default=60, help="制限時間（秒）")
+    parser.add_argument("--waves", metavar="PATH", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "waves.json"),
+                        help="ウェーブ表のJSONファイル")
+    parser.add_argument("--classic", action="store_true", help="ウェーブ表を使わず元のゲームの出方にする")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="ワーカープロセスの数")
+    parser.add_argument("--csv", metavar="PATH", default=None, help="1ゲームごとの結果を書き出すCSVファイル")
+    parser.add_argument("--summary-csv", metavar="PATH", default=None, help="まとめた表を書き出すCSVファイル")
+    args = parser.parse_args()
+
+    if args.seeds < 1:
+        parser.error("--seeds must be at least 1")
+    try:
+        tunings = configs(args.set)
+    except ValueError as e:
+        parser.error(str(e))
+    waves = None if args.classic else load_waves(args.waves, FPS)
+    jobs = [Job(i, tuning, policy, seed, args.total_time, waves)
+            for i, tuning in enumerate(tunings) for policy in args.policy for seed in range(args.seeds)]
+    print(f"{len(tunings)} configs x {len(args.policy)} policies x {args.seeds} seeds = {len(jobs)} games "
+          f"on {args.workers} workers", file=sys.stderr)
+
+    runs = []
+    t0 = time.perf_counter()
+    chunksize = max(1, min(16, math.ceil(len(jobs) / (args.workers * 8))))
+    with ProcessPoolExecutor(args.workers, initializer=init_worker) as pool:
+        for r in pool.map(play, jobs, chunksize=chunksize):
+            runs.append(r)
+            if len(runs) % 100 == 0:
+                elapsed = time.perf_counter() - t0
+                print(f"  {len(runs)}/{len(jobs)} games, {len(runs) / elapsed:.1f} games/s", file=sys.stderr)
+    elapsed = time.perf_counter() - t0
+    print(f"{len(jobs)} games in {elapsed:.1f} s ({len(jobs) / elapsed:.1f} games/s)", file=sys.stderr)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(runs[0]))
+            writer.writeheader()
+            writer.writerows(runs)
+
+    groups: dict[tuple[int, str], list[dict]] = {}
+    for r in runs:
+        groups.setdefault((r["config"], r["policy"]), []).append(r)
+    rows = [{"config": label(tunings[i]), "policy": policy, **summarize(group)}
+            for (i, policy), group in groups.items()]
+    if args.summary_csv:
+        with open(args.summary_csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    width = max(len(row["config"]) for row in rows)
+    print(f"{'config':<{width}} {'policy':>7} {'score':>7} {'p10':>6} {'p50':>6} {'p90':>6} "
+          f"{'alive[s]':>8} {'p10':>6} {'clear':>6} " + " ".join(f"{name:>6}" for name in mejirou.PROFILER.counters))
+    for row in rows:
+        print(f"{row['config']:<{width}} {row['policy']:>7} {row['score_mean']:>7.1f} {row['score_p10']:>6.0f} "
+              f"{row['score_p50']:>6.0f} {row['score_p90']:>6.0f} {row['survived_mean']:>8.1f} "
+              f"{row['survived_p10']:>6.1f} {row['cleared']:>6.0%} "
+              + " ".join(f"{row[f'{name}_max']:>6.1f}" for name in mejirou.PROFILER.counters))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+ティックごとのゲームの状態（スプライト数・点数・残り時間・フレーム時間など）の記録
+記録はarrayの列にためておき，ある行数ごとに別スレッドで列ごとのバイナリとしてファイルに書き足すので，
+ゲームのループはファイルの書き込みを待たない
+
+記録の概要の表示：python telemetry.py session.tlm
+"""
+import argparse
+import queue
+import struct
+import sys
+import threading
+from array import array
+
+import numpy as np
+
+
+MAGIC = b"MJTL"  # 記録ファイルの先頭
+VERSION = 1
+HEADER = struct.Struct("<4sBcB")  # 先頭，版，バイト順（"<"か">"），列の数
+COLUMN = struct.Struct("<B")  # 列の名前の長さ（この後に名前と型コード1文字が続く）
+CHUNK = struct.Struct("<I")  # まとまりの行数（この後に列ごとの値が続く）
+TYPECODES = "bBhHiIqQfd"  # 使える型（arrayとNumPyで大きさが同じもの）
+
+
+class Telemetry:
+    """
+    1行1ティックの記録を列ごとのarrayにため，batch行たまるごとに別スレッドでファイルに書き出すクラス
+    書き出し中の列とは別の列にためるので，record()は書き込みを待たない
+    """
+    def __init__(self, path: str, columns: list[tuple[str, str]], batch: int = 256):
+        """
+        引数1 path：記録ファイルのパス
+        引数2 columns：列の(名前, arrayの型コード)のリスト
+        引数3 batch：まとめて書き出す行数
+        """
+        for name, code in columns:
+            if code not in TYPECODES:
+                raise ValueError(f"column {name!r}: unsupported typecode {code!r} (choose from {TYPECODES})")
+        self.names = [name for name, _ in columns]
+        self.codes = [code for _, code in columns]
+        self.batch = batch
+        self.rows = 0  # 記録した行数
+        self.error: BaseException | None = None  # 書き出しで起きた例外
+        self._file = open(path, "wb")
+        header = [HEADER.pack(MAGIC, VERSION, b"<" if sys.byteorder == "little" else b">", len(columns))]
+        for name, code in columns:
+            encoded = name.encode()
+            header += [COLUMN.pack(len(encoded)), encoded, code.encode()]
+        self._file.write(b"".join(header))
+        self._free: queue.SimpleQueue[list[array]] = queue.SimpleQueue()  # 書き出し済みで再利用できる列
+        self._full: queue.SimpleQueue[tuple[list[array], int] | None] = queue.SimpleQueue()  # 書き出す列と行数
+        self._free.put(self._new_columns())
+        self._cols = self._new_columns()
+        self._n = 0  # ためている行数
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def _new_columns(self) -> list[array]:
+        return [array(code, bytes(self.batch * array(code).itemsize)) for code in self.codes]
+
+    def record(self, *values: float):
+        """
+        1行を記録する
+        引数 values：列と同じ順の値
+        """
+        n = self._n
+        for col, value in zip(self._cols, values):
+            col[n] = value
+        self._n = n + 1
+        self.rows += 1
+        if self._n == self.batch:
+            self.flush()
+
+    def flush(self):
+        """
+        ためている行を書き出しスレッドに渡す（待たずに戻る）
+        """
+        if self._n == 0:
+            return
+        self._full.put((self._cols, self._n))
+        try:
+            self._cols = self._free.get_nowait()
+        except queue.Empty:  # 書き出しが追いついていなければ新しい列を作る
+            self._cols = self._new_columns()
+        self._n = 0
+
+    def _run(self):
+        try:
+            while True:
+                item = self._full.get()
+                if item is None:
+                    break
+                cols, n = item
+                out = [CHUNK.pack(n)]
+                out += [memoryview(col)[:n].tobytes() for col in cols]
+                self._file.write(b"".join(out))
+                self._free.put(cols)
+        except BaseException as e:  # メインスレッドのclose()で改めて投げる
+            self.error = e
+        finally:
+            self._file.close()
+
+    def close(self):
+        """
+        残りの行を書き出し，書き出しが終わるまで待ってファイルを閉じる（書き出しで例外が起きていれば投げ直す）
+        """
+        self.flush()
+        self._full.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def load(path: str) -> dict[str, np.ndarray]:
+    """
+    記録ファイルを読み込む（書き出しの途中で終わった最後のまとまりは捨て，それまでの行を返す）
+    引数 path：ファイルのパス
+    戻り値：列の名前をキー，その列の全行の配列を値とする辞書（列の順は記録したときと同じ）
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, order, n_cols = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a telemetry log (version {VERSION})")
+    pos = HEADER.size
+    columns = []
+    for _ in range(n_cols):
+        (length,) = COLUMN.unpack_from(data, pos)
+        pos += COLUMN.size
+        name = data[pos:pos + length].decode()
+        code = chr(data[pos + length])
+        pos += length + 1
+        columns.append((name, np.dtype(code).newbyteorder(order.decode())))
+    chunks: list[list[np.ndarray]] = [[] for _ in columns]
+    row_size = sum(dtype.itemsize for _, dtype in columns)
+    while pos + CHUNK.size <= len(data):
+        (n,) = CHUNK.unpack_from(data, pos)
+        pos += CHUNK.size
+        if pos + n * row_size > len(data):  # 書き出しの途中で終わったまとまりは読まない
+            break
+        for parts, (_, dtype) in zip(chunks, columns):
+            parts.append(np.frombuffer(data, dtype, n, pos))
+            pos += n * dtype.itemsize
+    return {name: (np.concatenate(parts) if parts else np.empty(0, dtype)).astype(dtype.newbyteorder("="))
+            for (name, dtype), parts in zip(columns, chunks)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ティックごとの記録の概要を表示する")
+    parser.add_argument("path", help="記録ファイルのパス")
+    args = parser.parse_args()
+    cols = load(args.path)
+    n = len(next(iter(cols.values()))) if cols else 0
+    print(f"{args.path}: {n} ticks")
+    if n == 0:
+        return
+    print(f"{'column':>10} {'min':>9} {'mean':>9} {'p95':>9} {'max':>9}")
+    for name, values in cols.items():
+        print(f"{name:>10} {values.min():>9.2f} {values.mean():>9.2f} {np.percentile(values, 95):>9.2f} "
+              f"{values.max():>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
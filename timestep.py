@@ -0,0 +1,47 @@
+import time
+
+
+class FixedTimestep:
+    """
+    シミュレーションを一定間隔のティックで進め，描画は可能な速さで行うためのアキュムレータ
+    前のフレームからの経過時間をためておき，ティック1回分たまるごとに1ティック進める
+    """
+    def __init__(self, tick_rate: int, max_frame_time: float = 0.25):
+        """
+        引数1 tick_rate：1秒あたりのティック数
+        引数2 max_frame_time：1フレームで取り戻す最大の経過時間（秒）
+            これより遅れたフレームは切り捨て，処理落ちで追いつけなくなる悪循環を防ぐ
+        """
+        self.dt = 1 / tick_rate
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0.0
+        self.last = time.perf_counter()
+
+    def reset(self):
+        """
+        たまった時間を捨て，今から計り直す（画面切り替えの直後などに呼ぶ）
+        """
+        self.accumulator = 0.0
+        self.last = time.perf_counter()
+
+    def advance(self) -> int:
+        """
+        前回呼ばれてからの経過時間をため，今回進めるべきティック数を返す
+        戻り値：ティック数（0のこともある）
+        """
+        now = time.perf_counter()
+        frame_time = now - self.last
+        self.last = now
+        if frame_time > self.max_frame_time:
+            frame_time = self.max_frame_time
+        self.accumulator += frame_time
+        ticks = int(self.accumulator // self.dt)
+        self.accumulator -= ticks * self.dt
+        return ticks
+
+    @property
+    def alpha(self) -> float:
+        """
+        次のティックまでの進み具合（0〜1）．描画時にティック間を補間するのに使う
+        """
+        return self.accumulator / self.dt
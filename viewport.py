@@ -0,0 +1,75 @@
+import pygame as pg
+
+from assets import AssetManager
+
+
+class Viewport:
+    """
+    ゲームの論理解像度（座標はすべてこの大きさで扱う）と，実際に描く内部解像度・ウィンドウの対応を持つクラス
+    内部解像度が論理解像度と異なるかウィンドウの大きさが異なるときは，画面外のSurfaceに描いておき，
+    present()で1フレームに1回だけウィンドウへ拡大縮小して転送する
+    どちらも同じなら画面外のSurfaceを使わず，ウィンドウに直接描く
+    """
+    def __init__(self, window: pg.Surface, logical_size: tuple[int, int], scale: float = 1.0,
+                 smooth: bool = False, assets: AssetManager | None = None):
+        """
+        引数1 window：ウィンドウ（pg.display.set_modeの戻り値）
+        引数2 logical_size：論理解像度
+        引数3 scale：内部解像度の論理解像度に対する倍率（0.5なら縦横半分の解像度で描く）
+        引数4 smooth：ウィンドウへの転送にsmoothscaleを使うかどうか（Falseなら速いscale）
+        引数5 assets：描画用に縮小した画像を作って持っておくAssetManager
+        """
+        self.window = window
+        self.logical_size = logical_size
+        self.scale = scale
+        self.smooth = smooth
+        self.assets = assets or AssetManager()
+        self.size = (max(1, round(logical_size[0] * scale)), max(1, round(logical_size[1] * scale)))
+        # ウィンドウの中に縦横比を保って収まる表示領域（余りは黒い帯）
+        win_w, win_h = window.get_size()
+        fit = min(win_w / logical_size[0], win_h / logical_size[1])
+        self.dest = pg.Rect(0, 0, round(logical_size[0] * fit), round(logical_size[1] * fit))
+        self.dest.center = (win_w // 2, win_h // 2)
+        self.direct = scale == 1 and self.size == window.get_size()  # ウィンドウに直接描くかどうか
+        if self.direct:
+            self.surface = window
+        else:
+            self.surface = pg.Surface(self.size).convert()
+            window.fill((0, 0, 0))
+            self.target = window.subsurface(self.dest)
+
+    def rect(self, rect: pg.Rect) -> pg.Rect:
+        """
+        論理解像度の矩形を内部解像度の矩形に直す
+        """
+        s = self.scale
+        return pg.Rect(int(rect.x * s), int(rect.y * s), round(rect.width * s), round(rect.height * s))
+
+    def pos(self, rect: pg.Rect) -> tuple[int, int]:
+        """
+        論理解像度の矩形の左上を内部解像度の座標に直す
+        """
+        return int(rect.x * self.scale), int(rect.y * self.scale)
+
+    def image(self, img: pg.Surface) -> pg.Surface:
+        """
+        論理解像度の大きさの画像を内部解像度に合わせた画像にする（画像ごとに一度だけ縮小する）
+        """
+        return self.assets.scaled(img, self.scale)
+
+    def present(self, rects: list[pg.Rect] | None = None):
+        """
+        描いた内容をウィンドウに表示する
+        引数 rects：描き直した領域（ウィンドウに直接描くときだけ使う．Noneなら全体）
+        """
+        if self.direct:
+            if rects is None:
+                pg.display.update()
+            else:
+                pg.display.update(rects)
+            return
+        if self.smooth:
+            pg.transform.smoothscale(self.surface, self.dest.size, self.target)
+        else:
+            pg.transform.scale(self.surface, self.dest.size, self.target)
+        pg.display.update(self.dest)
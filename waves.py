@@ -0,0 +1,50 @@
+import json
+import zlib
+from typing import NamedTuple
+
+
+class Wave(NamedTuple):
+    """
+    ウェーブ（ある時刻からの敵の出方）の設定．時間はすべてティック数
+    """
+    start: int  # ウェーブが始まる時刻
+    enemy_every: int  # 敵機を出現させる間隔
+    enemies: int  # 1回に出現させる敵機の数
+    bomb_interval: tuple[int, int]  # 停止した敵機が爆弾を投下する間隔の範囲（敵機ごとにこの中から選ぶ）
+    timebird_every: int  # 時間めじろうを出現させる間隔
+
+
+def load_waves(path: str, tick_rate: int) -> list[Wave]:
+    """
+    ウェーブ表をJSONファイルから読み込む
+    ファイルは {"waves": [{"at": 秒, "enemy_every": 秒, "enemies": 数,
+                           "bomb_interval": [最小ティック, 最大ティック], "timebird_every": 秒}, ...]} の形で，
+    atの小さい順に並べ，最初のウェーブのatは0にする
+    引数1 path：ファイルのパス
+    引数2 tick_rate：1秒あたりのティック数（秒をティック数に直すのに使う）
+    戻り値：ウェーブのリスト
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    waves = []
+    for i, w in enumerate(data["waves"]):
+        lo, hi = w["bomb_interval"]
+        wave = Wave(round(w["at"] * tick_rate), max(1, round(w["enemy_every"] * tick_rate)), int(w["enemies"]),
+                    (int(lo), int(hi)), max(1, round(w["timebird_every"] * tick_rate)))
+        if not 1 <= wave.bomb_interval[0] <= wave.bomb_interval[1]:
+            raise ValueError(f"{path}: wave {i}: bad bomb_interval {w['bomb_interval']}")
+        if waves and wave.start <= waves[-1].start:
+            raise ValueError(f"{path}: wave {i}: 'at' must be increasing")
+        waves.append(wave)
+    if not waves or waves[0].start != 0:
+        raise ValueError(f"{path}: the first wave must start at 0")
+    return waves
+
+
+def table_hash(waves: list[Wave]) -> int:
+    """
+    ウェーブ表の内容から決まる32ビットのハッシュ値を返す（入力の記録に残し，再生時に同じ表か確かめるのに使う）
+    引数 waves：ウェーブのリスト
+    戻り値：ハッシュ値
+    """
+    return zlib.crc32(repr([tuple(w) for w in waves]).encode())